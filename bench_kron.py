@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+# Name: kron
+# Description: Uniform interface for dates and times
+# Version: 1.6.12
+# File: bench_kron.py
+# Author: qtfkwk <qtfkwk+kron@gmail.com>
+# Copyright: (C) 2016 by qtfkwk
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+"""Benchmarks for kron
+
+Runs offline via ``timeit`` and saves the results as JSON, so that runs
+for different releases or machines can be compared::
+
+    $ python bench_kron.py -o 1.6.12.json
+    $ python bench_kron.py -c 1.6.12.json -o new.json
+    $ python bench_kron.py -c 1.6.12.json new.json
+
+Each benchmark is calibrated to run for at least ``--min-time`` seconds
+per repeat; the times saved are seconds per call for each repeat.
+Benchmarks that fail with the kron being measured (e.g. an older
+release) are saved as skipped, with the error. Comparisons use the
+median and flag benchmarks slower than ``--threshold`` (default: 10%),
+exiting with status 1 if any are.
+
+Inputs are limited to what every release accepts, so that results of
+different releases can be compared.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+# Standard modules
+
+import argparse
+import collections
+import datetime
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import timeit
+
+# Internal modules
+
+import kron
+
+# Variables
+
+tz = 'America/New_York'
+
+# Functions
+
+def cases():
+    """Returns a list of (name, callable, cold) for the benchmarks;
+    ``cold`` callables are timed once per repeat instead of calibrated"""
+    t = kron.timestamp(1457128501.123456)
+    u = kron.timestamp(1457128562.5)
+    d = kron.duration(3600.5)
+    e = kron.duration(1.25)
+    # distinct seconds, more than the per-second string cache holds
+    seconds = itertools.cycle([kron.timestamp(1457128501.25 + 97 * i) \
+        for i in range(4096)])
+    r = [
+        ('duration_init', lambda: kron.duration(3600.5), False),
+        ('duration_add', lambda: d + e, False),
+        ('duration_mul', lambda: d * 2.5, False),
+        ('duration_lt', lambda: d < e, False),
+        ('timestamp_init_float', lambda: kron.timestamp(1457128501.123456), \
+            False),
+        ('timestamp_init_now', lambda: kron.timestamp(), False),
+        ('timestamp_init_str', \
+            lambda: kron.timestamp('2016-03-04 21:55:01', 'UTC'), False),
+        ('timestamp_init_iso8601', lambda: kron.timestamp( \
+            '2016-03-04T21:55:01Z', fmt='iso8601'), False),
+        ('timestamp_add', lambda: t + d, False),
+        ('timestamp_sub', lambda: u - t, False),
+        ('timestamp_eq', lambda: t == u, False),
+        ('timestamp_lt', lambda: t < u, False),
+        ('timestamp_str_same_second', lambda: t.str(tz, 'basetz'), False),
+        ('timestamp_dict_all', lambda: t.dict(tz, 'all'), False),
+    ]
+    for fmt in sorted(kron.timestamp.formats):
+        r.append(('timestamp_str:' + fmt, \
+            lambda fmt=fmt: next(seconds).str(tz, fmt), False))
+    for name, query in (('exact', 'America/New_York'), ('partial', 'york'), \
+            ('regex', '^america/[a-c]')):
+        r.append(('timezone_search_' + name, \
+            lambda query=query: kron.timezone.search(query), False))
+    r += [
+        ('time_parse', lambda: kron.time('2016-03-04 21:55:01', 'UTC'), \
+            False),
+        ('time_parse_iso8601', \
+            lambda: kron.time('2016-03-04T21:55:01Z', fmt='iso8601'), False),
+        ('cli_cold_start', cli_cold_start, True),
+    ]
+    return r
+
+def cli_cold_start():
+    """Runs the command line tool in a new interpreter"""
+    with open(os.devnull, 'w') as f:
+        subprocess.check_call([sys.executable, \
+            os.path.abspath(kron.__file__), '-T', 'UTC', '-f', 'iso8601', \
+            '1457128501'], stdout=f)
+
+def run(pattern=None, repeat=5, min_time=0.2, stream=sys.stderr):
+    """Runs the benchmarks whose names match the regular expression
+    ``pattern`` and returns the results as a dictionary"""
+    r = collections.OrderedDict()
+    for name, func, cold in cases():
+        if pattern and not re.search(pattern, name):
+            continue
+        try:
+            func()
+        except Exception as e:
+            r[name] = dict(skipped='%s: %s' % (type(e).__name__, e))
+            print('%-40s skipped (%s)' % (name, r[name]['skipped']), \
+                file=stream)
+            continue
+        timer = timeit.Timer(func)
+        if cold:
+            loops = 1
+        else:
+            loops = 1
+            while timer.timeit(loops) < min_time / 10:
+                loops *= 10
+            loops = max(1, int(loops * min_time / max(timer.timeit(loops), \
+                1e-9)))
+        times = [i / loops for i in timer.repeat(repeat, loops)]
+        r[name] = dict(loops=loops, times=times, best=min(times), \
+            median=median(times))
+        print('%-40s %s' % (name, human(r[name]['median'])), file=stream)
+    return dict(
+        kron=kron.__version__,
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        platform=platform.platform(),
+        date=datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        benchmarks=r,
+    )
+
+def compare(old, new, threshold=0.1, stream=sys.stdout):
+    """Prints the median times of the results ``old`` and ``new`` side
+    by side; returns the names of the benchmarks slower by more than
+    ``threshold``"""
+    r = []
+    print('%-40s %10s %10s %8s' % ('benchmark', old['kron'], new['kron'], \
+        'ratio'), file=stream)
+    for name in new['benchmarks']:
+        a = old['benchmarks'].get(name, {}).get('median')
+        b = new['benchmarks'][name].get('median')
+        if name not in old['benchmarks']:
+            continue
+        if a == None or b == None:
+            print('%-40s %10s %10s' % (name, human(a) if a else 'skipped', \
+                human(b) if b else 'skipped'), file=stream)
+            continue
+        ratio = b / a if a else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = ' slower'
+            r.append(name)
+        elif ratio < 1 / (1 + threshold):
+            flag = ' faster'
+        print('%-40s %10s %10s %7.2fx%s' % (name, human(a), human(b), ratio, \
+            flag), file=stream)
+    return r
+
+def human(seconds):
+    """Returns ``seconds`` as a string in ns, us, ms, or s"""
+    for unit, scale in (('ns', 1e-9), ('us', 1e-6), ('ms', 1e-3)):
+        if seconds < scale * 1000:
+            return '%.1f %s' % (seconds / scale, unit)
+    return '%.2f s' % seconds
+
+def median(values):
+    """Returns the median of ``values``"""
+    v = sorted(values)
+    n = len(v)
+    return v[n // 2] if n % 2 else (v[n // 2 - 1] + v[n // 2]) / 2
+
+def load(path):
+    """Returns the results saved in the JSON file ``path``"""
+    with open(path) as f:
+        return json.load(f)
+
+def main(argv=None):
+    """Command line interface; returns the exit status"""
+    p = argparse.ArgumentParser(description='Benchmarks for kron')
+    p.add_argument('-k', metavar='PATTERN', action='store', \
+        help='only run benchmarks matching the regular expression')
+    p.add_argument('-r', '--repeat', metavar='N', type=int, default=5, \
+        help='number of repeats; default: 5')
+    p.add_argument('--min-time', metavar='SECONDS', type=float, default=0.2, \
+        help='minimum time per repeat; default: 0.2')
+    p.add_argument('-o', '--output', metavar='FILE', action='store', \
+        help='save the results as JSON')
+    p.add_argument('-c', '--compare', metavar='FILE', nargs='+', \
+        help='compare with saved results; given two files, compare them '
+            'without running')
+    p.add_argument('-t', '--threshold', type=float, default=0.1, \
+        help='relative slowdown reported as a regression; default: 0.1')
+    p.add_argument('-l', '--list', action='store_true', \
+        help='list the benchmarks and exit')
+    a = p.parse_args(argv)
+    if a.list:
+        for name, func, cold in cases():
+            if not a.k or re.search(a.k, name):
+                print(name)
+        return 0
+    if a.compare and len(a.compare) > 2:
+        p.error('--compare takes one or two files')
+    if a.compare and len(a.compare) == 2:
+        new = load(a.compare[1])
+    else:
+        new = run(a.k, a.repeat, a.min_time)
+    if a.output:
+        with open(a.output, 'w') as f:
+            json.dump(new, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if a.compare:
+        return 1 if compare(load(a.compare[0]), new, a.threshold) else 0
+    return 0
+
+# Main
+
+if __name__ == '__main__':
+    sys.exit(main())
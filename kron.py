@@ -16,41 +16,149 @@
 
 from __future__ import division
 from __future__ import print_function
-from past.builtins import cmp
 from builtins import object
 
 # Standard modules
 
-import argparse
+import bisect
+import collections
 import datetime
-import json
+import itertools
+import operator
+import os
 import re
-import calendar
+import threading
+import time as _time
 
 # External modules
 
-import ntplib
 import pytz
-import tzlocal
+
+# Imported on first use: argparse (cli), calendar (_parser), json
+# (_json and cli), ntplib (time_ntp), numpy (timestamp_array), and
+# tzlocal (local timezone detection)
+
+numpy = None
 
 # Variables
 
 __version__ = '1.6.12'
 
+_local = dict(name=None, stamp=None)
+
+_epoch = datetime.datetime(1970, 1, 1)
+
+_offsets = {}
+
+# NTP measurements per (server, port): (epoch seconds minus monotonic
+# clock, monotonic clock when measured, uncertainty), and the assumed
+# drift of the local clock since the measurement in seconds per second
+_ntp = {}
+_ntp_drift = 15e-6
+
+# Recent NTP queries as ``ntp_sample`` objects, and the functions called
+# with each
+_ntp_history = collections.deque(maxlen=256)
+_ntp_hooks = []
+
+_monotonic = getattr(_time, 'monotonic', _time.time)
+_perf_counter = getattr(_time, 'perf_counter', _time.time)
+
+# Int epoch nanoseconds in UTC from the system clock (via the float
+# ``time.time()`` before Python 3.7), and the shared coarse ``clock``
+_time_ns = getattr(_time, 'time_ns', lambda: int(_time.time() * 10**9))
+_clock = None
+_clock_lock = threading.Lock()
+
 # Classes
 
+class clock(object):
+    """Coarse clock for high-rate event stamping
+
+    A daemon thread stores the system time in ``ns`` (int epoch
+    nanoseconds in UTC) once per ``tick`` seconds, so that reading the
+    current time is an attribute access; readings lag the system clock
+    by up to ``tick`` seconds. A new ``tick`` takes effect after the
+    current one, and ``stop`` stops the thread, freezing ``ns``.
+
+    Threads do not survive ``fork()``; where ``os.register_at_fork`` is
+    available (Python 3.7+), running clocks start a new thread in the
+    child process.
+    """
+
+    _running = set()
+
+    def __init__(self, tick=0.001):
+        self.tick = tick
+        self.ns = _time_ns()
+        self._start()
+
+    def _start(self):
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='kron.clock')
+        self._thread.daemon = True
+        self._thread.start()
+        self._running.add(self)
+
+    @property
+    def value(self):
+        """Float epoch seconds in UTC"""
+        return self.ns / 10**9
+
+    def now(self):
+        """Returns the current coarse time as a ``timestamp``"""
+        return timestamp._from_ns(self.ns)
+
+    def stop(self):
+        """Stops refreshing ``ns``; if this is the shared clock,
+        ``coarse_clock`` starts a new one on next use"""
+        global _clock
+        self._stopped.set()
+        self._thread.join()
+        self._running.discard(self)
+        with _clock_lock:
+            if _clock is self:
+                _clock = None
+
+    @classmethod
+    def _after_fork(cls):
+        """Restarts the running clocks in a child process"""
+        global _clock_lock
+        _clock_lock = threading.Lock()
+        for i in list(cls._running):
+            i.ns = _time_ns()
+            i._start()
+
+    def _run(self):
+        while not self._stopped.wait(self.tick):
+            self.ns = _time_ns()
+
 class duration(object):
     """Represents a duration of time
     
     ``value`` is float seconds.
 
-    Internal storage is float seconds and accessible via the ``value``
-    property.
+    Internal storage is int nanoseconds, so arithmetic and comparisons
+    are exact; the ``ns`` and ``us`` properties return int nanoseconds
+    and microseconds and the ``value`` property returns float seconds.
+    Int/float seconds are rounded to whole microseconds as always; use
+    ``duration.from_ns`` for nanosecond precision, which float
+    multiplication and division then preserve.
+
+    Duration objects use ``__slots__``; each takes 40 bytes for the
+    object plus its int of nanoseconds on 64-bit CPython 3.11: 72 bytes
+    for durations up to about 36 years (32-byte int) and 76 bytes
+    beyond, compared to about 110 bytes for an object with an instance
+    dictionary holding a float.
 
     Duration objects can be compared via ``<``, ``>``, ``<=``, ``>=``,
     ``==``, and ``!=`` with each other or an int/float value in
     seconds.
 
+    Duration objects are hashable, consistent with ``==``, so they can
+    be used in sets and as dict keys; ``duration(5)`` and ``5`` are the
+    same key.
+
     Duration objects support various arithmetic operations via ``+``,
     ``-``, ``*``, ``/``.
 
@@ -73,11 +181,60 @@ class duration(object):
     ``DurationMultipyError``, or ``DurationSubtractError``.
     """
 
+    __slots__ = ('_ns',)
+
     _units = ('days', 'hours', 'minutes', 'seconds')
     _values = dict(days=86400, hours=3600, minutes=60, seconds=1)
 
     def __init__(self, value=0):
-        self.value = float(round(value, 6))
+        self._ns = _nanos(value)
+
+    @classmethod
+    def from_ns(cls, ns):
+        """Returns a new object for int nanoseconds ``ns``"""
+        return cls._from_ns(int(ns))
+
+    @classmethod
+    def from_timedelta(cls, td):
+        """Returns a new object for the ``datetime.timedelta`` ``td``,
+        exactly"""
+        return cls._from_micros((td.days * 86400 + td.seconds) * 10**6 + \
+            td.microseconds)
+
+    @classmethod
+    def _from_ns(cls, ns):
+        """Returns a new object for int nanoseconds ``ns`` without
+        validation"""
+        r = object.__new__(cls)
+        r._ns = ns
+        return r
+
+    @classmethod
+    def _from_micros(cls, us):
+        """Returns a new object for int microseconds ``us`` without
+        validation"""
+        r = object.__new__(cls)
+        r._ns = us * 1000
+        return r
+
+    @property
+    def ns(self):
+        """Int nanoseconds"""
+        return self._ns
+
+    @property
+    def us(self):
+        """Int microseconds (floor)"""
+        return self._ns // 1000
+
+    @property
+    def value(self):
+        """Float seconds"""
+        return self._ns / 10**9
+
+    @value.setter
+    def value(self, value):
+        self._ns = _nanos(value)
 
     def dict(self):
         """Returns a dictionary with the duration as the count of
@@ -90,19 +247,24 @@ class duration(object):
             v -= r[i] * self._values[i]
         return r
 
+    def to_timedelta(self):
+        """Returns the duration as a ``datetime.timedelta``, truncated
+        to whole microseconds (floor)"""
+        return datetime.timedelta(microseconds=self._ns // 1000)
+
     def __cmp__(self, y):
         """Compare two duration objects"""
         if isinstance(y, duration):
-            return cmp(self.value, y.value)
+            return (self._ns > y._ns) - (self._ns < y._ns)
         elif isinstance(y, (int, float)):
-            return cmp(self.value, y)
+            return (self.value > y) - (self.value < y)
         else:
             raise DurationComparisonError
 
     def __lt__(self, y):
         """Compare two duration objects via < (Python 3)"""
         if isinstance(y, duration):
-            return self.value < y.value
+            return self._ns < y._ns
         elif isinstance(y, (int, float)):
             return self.value < y
         else:
@@ -111,7 +273,7 @@ class duration(object):
     def __le__(self, y):
         """Compare two duration objects via <= (Python 3)"""
         if isinstance(y, duration):
-            return self.value <= y.value
+            return self._ns <= y._ns
         elif isinstance(y, (int, float)):
             return self.value <= y
         else:
@@ -120,7 +282,7 @@ class duration(object):
     def __gt__(self, y):
         """Compare two duration objects via > (Python 3)"""
         if isinstance(y, duration):
-            return self.value > y.value
+            return self._ns > y._ns
         elif isinstance(y, (int, float)):
             return self.value > y
         else:
@@ -129,7 +291,7 @@ class duration(object):
     def __ge__(self, y):
         """Compare two duration objects via >= (Python 3)"""
         if isinstance(y, duration):
-            return self.value >= y.value
+            return self._ns >= y._ns
         elif isinstance(y, (int, float)):
             return self.value >= y
         else:
@@ -138,50 +300,74 @@ class duration(object):
     def __eq__(self, y):
         """Compare two duration objects via == (Python 3)"""
         if isinstance(y, duration):
-            return self.value == y.value
+            return self._ns == y._ns
         elif isinstance(y, (int, float)):
             return self.value == y
         else:
             raise DurationComparisonError
 
+    def __ne__(self, y):
+        """Compare two duration objects via != (Python 3)"""
+        return not self.__eq__(y)
+
+    def __hash__(self):
+        """Hash consistent with ``==``, including int/float values in
+        seconds"""
+        return hash(self.value)
+
     def __add__(self, y):
         """Add two durations or a duration and an int or float"""
         if isinstance(y, duration):
-            return duration(self.value + y.value)
+            return duration._from_ns(self._ns + y._ns)
         elif isinstance(y, (int, float)):
-            return duration(self.value + y)
+            return duration._from_ns(self._ns + _nanos(y))
         elif isinstance(y, timestamp):
-            return timestamp(self.value + y.value)
+            return timestamp._from_ns(self._ns + y._ns)
         else:
             raise DurationAddError
 
     def __sub__(self, y):
         """Subtract two durations or a duration and an int or float"""
         if isinstance(y, duration):
-            return duration(self.value - y.value)
+            return duration._from_ns(self._ns - y._ns)
         elif isinstance(y, (int, float)):
-            return duration(self.value - y)
+            return duration._from_ns(self._ns - _nanos(y))
         else:
             raise DurationSubtractError
 
     def __mul__(self, y):
         """Multiply a duration by an int or float"""
-        if isinstance(y, (int, float)):
+        if isinstance(y, int):
+            return duration._from_ns(self._ns * y)
+        elif isinstance(y, float):
+            if self._ns % 1000:
+                return duration._from_ns(int(round(self._ns * y)))
             return duration(self.value * y)
         else:
             raise DurationMultiplyError
 
+    def _divide(self, y):
+        """Divide by an int or float, rounding to whole nanoseconds if
+        the duration has sub-microsecond precision or else to whole
+        microseconds as float seconds always have"""
+        if not self._ns % 1000:
+            return duration(self.value / y)
+        elif isinstance(y, int):
+            n = self._ns * 2 + y if y > 0 else -self._ns * 2 - y
+            return duration._from_ns(n // (abs(y) * 2))
+        return duration._from_ns(int(round(self._ns / y)))
+
     def __div__(self, y):
         """Divide a duration by an int or float"""
         if isinstance(y, (int, float)):
-            return duration(self.value / y)
+            return self._divide(y)
         else:
             raise DurationDivideError
 
     def __truediv__(self, y):
         """Divide a duration by an int or float"""
         if isinstance(y, (int, float)):
-            return duration(self.value / y)
+            return self._divide(y)
         else:
             raise DurationDivideError
 
@@ -192,6 +378,700 @@ class duration(object):
         else:
             raise DurationDivideError
 
+class ntp_reading(float):
+    """Float epoch seconds in UTC returned by ``time_ntp``
+
+    ``age`` is the number of seconds since the NTP measurement the
+    reading is based on, and ``uncertainty`` estimates its error in
+    seconds: half the round-trip delay of the measurement plus the
+    possible drift of the local clock since.
+    """
+
+    __slots__ = ('age', 'uncertainty')
+
+    def __new__(cls, value, age=0.0, uncertainty=0.0):
+        r = float.__new__(cls, value)
+        r.age = age
+        r.uncertainty = uncertainty
+        return r
+
+class ntp_sample(collections.namedtuple('ntp_sample', ('time', 'server',
+        'port', 'offset', 'delay', 'stratum', 'latency', 'error'))):
+    """NTP query recorded in ``ntp_history``
+
+    * ``time``: float epoch seconds of the system clock when recorded
+    * ``server`` and ``port``: as given to ``time_ntp``
+    * ``offset``: seconds to add to the system clock per the server
+    * ``delay``: round-trip delay in seconds per the NTP timestamps
+    * ``stratum``: stratum of the server
+    * ``latency``: seconds from sending the request to the response or
+      failure
+    * ``error``: None, or 'timeout', 'resolve' (name lookup), 'network',
+      or 'protocol' if the query failed, in which case ``offset``,
+      ``delay``, and ``stratum`` are None
+    """
+
+    __slots__ = ()
+
+class _lru(object):
+    """Bounded, thread-safe least recently used cache with hit, miss,
+    and eviction counters"""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Returns the value for ``key`` and marks it as most recently
+        used, or ``default`` if missing"""
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Stores ``value`` for ``key``, evicting the least recently
+        used entries beyond ``maxsize``"""
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            self._evict()
+
+    def setdefault(self, key, value):
+        """Stores ``value`` for ``key`` unless already present; returns
+        the stored value"""
+        with self._lock:
+            if key in self._data:
+                return self._data[key]
+            self._data[key] = value
+            self._evict()
+            return value
+
+    def discard(self, key):
+        """Removes ``key`` if present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Removes all entries and resets the counters"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def reset(self):
+        """Resets the counters"""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def resize(self, maxsize):
+        """Changes ``maxsize``, evicting entries as needed"""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def info(self):
+        """Returns the counters and sizes as a dictionary"""
+        with self._lock:
+            return dict(hits=self.hits, misses=self.misses,
+                evictions=self.evictions, size=len(self._data),
+                maxsize=self.maxsize)
+
+    def _evict(self):
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+class _tzindex(object):
+    """Search index over timezone names used by ``timezone.search``
+
+    Exact names are found via a set and a case-folded dictionary.
+    Queries without regular expression metacharacters (``new_york``,
+    ``Europe/``, ``pacific``) are found via ``str.find`` over a single
+    newline-joined string of lowercase names, whose offsets map back to
+    names via ``bisect``. Only real regular expressions fall back to a
+    scan, with compiled patterns kept in a small cache.
+    """
+
+    _literal = re.compile(r'^[^\\.^$*+?{}\[\]|()\n]*$')
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.exact = set(self.names)
+        self.lowered = [t.lower() for t in self.names]
+        self.folded = {}
+        for t_, t in zip(self.lowered, self.names):
+            self.folded.setdefault(t_, t)
+        self.starts = []
+        i = 0
+        for t_ in self.lowered:
+            self.starts.append(i)
+            i += len(t_) + 1
+        self.haystack = '\n'.join(self.lowered)
+        self.patterns = _lru(64)
+
+    def search(self, name):
+        """Same result as a case-insensitive ``re.search`` of ``name``
+        against every name; see ``timezone.search``"""
+        if name in self.exact:
+            return name
+        name_ = name.lower()
+        if name_ in self.folded:
+            return self.folded[name_]
+        if self._literal.match(name):
+            matches = self._substring(name_)
+        else:
+            matches = self._regex(name, name_)
+        if len(matches) == 1:
+            return matches[0]
+        else:
+            return matches
+
+    def _substring(self, name_):
+        """Returns the names containing the lowercase literal ``name_``"""
+        r = []
+        i = self.haystack.find(name_)
+        while i != -1:
+            k = bisect.bisect_right(self.starts, i) - 1
+            r.append(self.names[k])
+            if k + 1 == len(self.starts):
+                break
+            i = self.haystack.find(name_, self.starts[k + 1])
+        return r
+
+    def _regex(self, name, name_):
+        """Returns the names matching the regular expression ``name``"""
+        p = self.patterns.get(name)
+        if p is None:
+            p = (re.compile(name), re.compile(name_))
+            self.patterns.put(name, p)
+        p, p_ = p
+        return [t for t, t_ in zip(self.names, self.lowered) \
+            if p.search(t) or p_.search(t_)]
+
+class _parser(object):
+    """Parser compiled from a ``strptime`` format string
+
+    Supports the numeric directives, English month and weekday names,
+    ``%p``, ``%z``, and ``%Z`` (UTC, GMT, or a name in ``time.tzname``
+    when first compiled, ignored as by ``strptime``); ``regex`` is None
+    for formats with any other directive, which are left to
+    ``strptime``.
+    """
+
+    _directives = dict(
+        Y=r'(?P<Y>\d{4})',
+        y=r'(?P<y>\d\d)',
+        m=r'(?P<m>1[0-2]|0[1-9]|[1-9])',
+        d=r'(?P<d>3[01]|[12]\d|0[1-9]|[1-9]| [1-9])',
+        H=r'(?P<H>2[0-3]|[0-1]\d|\d)',
+        I=r'(?P<I>1[0-2]|0[1-9]|[1-9])',
+        M=r'(?P<M>[0-5]\d|\d)',
+        S=r'(?P<S>6[0-1]|[0-5]\d|\d)',
+        f=r'(?P<f>\d{1,6})',
+        j=r'(?P<j>36[0-6]|3[0-5]\d|[12]\d\d|0[1-9]\d|00[1-9]|[1-9]\d|' \
+            r'0[1-9]|[1-9])',
+        p=r'(?P<p>am|pm)',
+        z=r'(?P<z>z|[+-]\d\d:?[0-5]\d(?::?[0-5]\d)?)',
+    )
+    _mdays = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+    _months = None
+    _cache = _lru(64)
+
+    @classmethod
+    def compile(cls, spec):
+        """Returns the cached parser for ``spec``, compiling it on
+        first use"""
+        r = cls._cache.get(spec)
+        if r == None:
+            r = cls._cache.setdefault(spec, cls(spec))
+        return r
+
+    @classmethod
+    def _names(cls):
+        """Adds the month and weekday name directives, determined once
+        via ``calendar``, and the timezone names accepted by ``%Z``"""
+        if cls._months == None:
+            import calendar
+            m = dict((m.lower(), i) for i, m in \
+                list(enumerate(calendar.month_abbr)) + \
+                list(enumerate(calendar.month_name)) if m)
+            names = '|'.join(sorted(m, key=len, reverse=True))
+            days = '|'.join(sorted([d.lower() for d in \
+                list(calendar.day_abbr) + list(calendar.day_name)], \
+                key=len, reverse=True))
+            for c in 'bBh':
+                cls._directives[c] = r'(?P<%s>%s)' % (c, names)
+            for c in 'aA':
+                cls._directives[c] = r'(?:%s)' % days
+            zones = set(['utc', 'gmt'] + [z.lower() for z in _time.tzname])
+            cls._directives['Z'] = r'(?:%s)' % '|'.join(re.escape(z) \
+                for z in sorted(zones, key=len, reverse=True))
+            cls._months = m
+
+    def __init__(self, spec):
+        self._names()
+        self.spec = spec
+        self.regex = None
+        r = []
+        i = 0
+        while i < len(spec):
+            c = spec[i]
+            if c == '%' and i + 1 < len(spec):
+                i += 1
+                c = spec[i]
+                if c == '%':
+                    r.append('%')
+                elif c in self._directives:
+                    r.append(self._directives[c])
+                else:
+                    return
+            elif c.isspace():
+                r.append(r'\s+')
+            else:
+                r.append(re.escape(c))
+            i += 1
+        try:
+            regex = re.compile(''.join(r) + r'\Z', re.IGNORECASE)
+        except re.error:
+            return
+        # group index of each directive, or None
+        g = dict((k, v - 1) for k, v in regex.groupindex.items())
+        for c in 'YymdHIMSfjpz':
+            setattr(self, '_' + c, g.get(c))
+        self._month = g.get('b', g.get('B', g.get('h')))
+        self._ordinal = self._j != None and self._m == None and self._d == None
+        self.regex = regex
+
+    def parse(self, value):
+        """Returns ``(seconds, microseconds, offset)`` for the string
+        ``value``, where ``seconds`` is epoch seconds of the local time
+        and ``offset`` is the UTC offset in seconds given by ``%z`` or
+        None; raises ``ValueError``"""
+        m = self.regex.match(value)
+        if m == None:
+            raise ValueError('time data %r does not match format %r' % \
+                (value, self.spec))
+        g = m.groups()
+        if self._Y != None:
+            year = int(g[self._Y])
+        elif self._y != None:
+            year = int(g[self._y])
+            year += 2000 if year < 69 else 1900
+        else:
+            year = 1900
+        if self._m != None:
+            month = int(g[self._m])
+        elif self._month != None:
+            month = self._months[g[self._month].lower()]
+        else:
+            month = 1
+        day = 1 if self._d == None else int(g[self._d])
+        if day > 28 and day > self._mdays[month] + (month == 2 and \
+        year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)):
+            raise ValueError('day is out of range for month')
+        if self._ordinal:
+            days = _days_from_civil(year, 1, 1) + int(g[self._j]) - 1
+        else:
+            days = _days_from_civil(year, month, day)
+        if self._I != None:
+            hour = int(g[self._I]) % 12
+            if self._p != None and g[self._p].lower() == 'pm':
+                hour += 12
+        elif self._H != None:
+            hour = int(g[self._H])
+        else:
+            hour = 0
+        r = days * 86400 + hour * 3600
+        if self._M != None:
+            r += int(g[self._M]) * 60
+        if self._S != None:
+            second = int(g[self._S])
+            if second > 59:
+                raise ValueError('second must be in 0..59')
+            r += second
+        us = 0 if self._f == None else int(g[self._f].ljust(6, '0'))
+        if self._z == None:
+            return r, us, None
+        z = g[self._z]
+        if z in 'zZ':
+            return r, us, 0
+        z = z.replace(':', '')
+        offset = int(z[1:3]) * 3600 + int(z[3:5]) * 60 + int(z[5:7] or 0)
+        return r, us, -offset if z[0] == '-' else offset
+
+class _isoparser(object):
+    """Parser for ISO 8601 / RFC 3339 date and time strings, used for
+    the 'iso8601' format instead of ``strptime``
+
+    Accepts calendar dates in the extended (``2016-03-04``) or basic
+    (``20160304``) format, optionally followed by ``T``, ``t``, or a
+    space and a time of hours, minutes, and seconds with a fraction of
+    up to 9 digits (``21:55:01.123456789``, ``215501,5``, ``21:55``),
+    and a UTC offset (``Z``, ``+02:00``, ``-0530``, ``+02``). The date
+    and time must both be extended or both basic; an extended time may
+    have a basic offset (``-0530``, as from ``%z``), but not the
+    reverse. Times without an offset are UTC, as with the 'iso8601'
+    format. Leap seconds (``:60``) are rejected, since epoch seconds
+    cannot represent them. Has the same ``parse`` interface as
+    ``_parser``.
+    """
+
+    regex = re.compile(r'(?:(\d{4})-(\d\d)-(\d\d)(?:[Tt ](\d\d)'
+        r'(?::(\d\d)(?::(\d\d)(?:[.,](\d{1,9}))?)?)?)?'
+        r'(?:([Zz])|([+-])(\d\d)(?::?(\d\d))?)?'
+        r'|(\d{4})(\d\d)(\d\d)(?:[Tt ](\d\d)'
+        r'(?:(\d\d)(?:(\d\d)(?:[.,](\d{1,9}))?)?)?)?'
+        r'(?:([Zz])|([+-])(\d\d)(\d\d)?)?)\Z')
+
+    @classmethod
+    def parse(cls, value):
+        """Returns ``(seconds, microseconds, offset)`` for the string
+        ``value``, as ``_parser.parse``; raises ``ValueError``"""
+        r, ns, offset = cls._parse(value)
+        return r, ns // 1000, offset
+
+    @classmethod
+    def ns(cls, value):
+        """Returns int UTC epoch nanoseconds for the string ``value``;
+        raises ``ValueError``"""
+        r, ns, offset = cls._parse(value)
+        return (r - offset) * 10**9 + ns
+
+    @classmethod
+    def _parse(cls, value):
+        m = cls.regex.match(value)
+        if m == None:
+            raise ValueError('time data %r does not match ISO 8601' % value)
+        g = m.groups()
+        y, mo, d, h, mi, s, f, z, sign, oh, om = g[:11] if g[0] else g[11:]
+        year, month, day = int(y), int(mo), int(d)
+        if not 1 <= month <= 12 or day < 1 or day > 28 and \
+                day > _parser._mdays[month] + (month == 2 and year % 4 == 0 \
+                and (year % 100 != 0 or year % 400 == 0)):
+            raise ValueError('day is out of range for month in %r' % value)
+        r = _days_from_civil(year, month, day) * 86400
+        if h != None:
+            h, mi, s = int(h), int(mi or 0), int(s or 0)
+            if h > 23 or mi > 59 or s > 59:
+                raise ValueError('time is out of range in %r' % value)
+            r += h * 3600 + mi * 60 + s
+        offset = 0
+        if sign != None:
+            offset = int(oh) * 3600 + int(om or 0) * 60
+            if offset >= 86400 or int(om or 0) > 59:
+                raise ValueError('offset is out of range in %r' % value)
+            if sign == '-':
+                offset = -offset
+        return r, 0 if f == None else int(f.ljust(9, '0')), offset
+
+class _plan(object):
+    """Output format compiled from a ``strftime`` format string
+
+    The format is split once into a template of literal text and a list
+    of field emitters, which render a fields tuple ``(year, month, day,
+    hour, minute, second, microsecond, offset, tzname, datetime)`` with
+    ``offset`` in seconds (None if naive) and ``datetime`` optional.
+    Directives without an emitter (``%c``, ``%x``, flags, ...) are
+    passed to ``strftime`` as is, and ``strftime`` is then True: those
+    need the fields tuple of an aware ``datetime``. Names (``%a``,
+    ``%b``, ``%p``, ...) come from the locale in effect when the first
+    plan is compiled.
+
+    ``second`` is True if the output only depends on the whole second
+    apart from ``%f``, so that ``split`` can render the rest once per
+    second.
+
+    If ``nth`` is True, ``%d`` renders the day with ordinal letters, as
+    used by the ``Month_Nth`` family of formats.
+    """
+
+    _cache = _lru(256)
+    _names = None
+
+    @classmethod
+    def compile(cls, spec, nth=False):
+        """Returns the cached plan for ``spec``, compiling it on first
+        use"""
+        key = (spec, nth)
+        r = cls._cache.get(key)
+        if r == None:
+            r = cls._cache.setdefault(key, cls(spec, nth))
+        return r
+
+    @classmethod
+    def _locale(cls):
+        """Returns the locale names and ``%Y`` conversion, determined
+        once via ``strftime``"""
+        if cls._names == None:
+            w = [datetime.date(2001, 1, i) for i in range(1, 8)]
+            m = [datetime.date(2001, i, 1) for i in range(1, 13)]
+            h = [datetime.datetime(2001, 1, 1, i) for i in (0, 12)]
+            r = dict((c, [i.strftime('%' + c) for i in v]) for c, v in \
+                (('a', w), ('A', w), ('b', m), ('B', m), ('p', h)))
+            try:
+                y = datetime.date(999, 1, 1).strftime('%Y')
+            except ValueError:
+                y = '999'
+            r['Y'] = '%04d' if y == '0999' else '%d'
+            cls._names = r
+        return cls._names
+
+    def __init__(self, spec, nth=False):
+        self.spec = spec
+        n = self._locale()
+        emitters = dict(
+            a=('%s', lambda f: n['a'][_weekday(f)]),
+            A=('%s', lambda f: n['A'][_weekday(f)]),
+            b=('%s', lambda f: n['b'][f[1] - 1]),
+            B=('%s', lambda f: n['B'][f[1] - 1]),
+            d=('%02d', 2),
+            f=('%06d', 6),
+            H=('%02d', 3),
+            I=('%02d', lambda f: (f[3] + 11) % 12 + 1),
+            j=('%03d', lambda f: _yearday(f) + 1),
+            m=('%02d', 1),
+            M=('%02d', 4),
+            p=('%s', lambda f: n['p'][f[3] >= 12]),
+            S=('%02d', 5),
+            U=('%02d', \
+                lambda f: (_yearday(f) + 7 - (_weekday(f) + 1) % 7) // 7),
+            w=('%d', lambda f: (_weekday(f) + 1) % 7),
+            W=('%02d', lambda f: (_yearday(f) + 7 - _weekday(f)) // 7),
+            y=('%02d', lambda f: f[0] % 100),
+            Y=(n['Y'], 0),
+            z=('%s', lambda f: _offsets.get(f[7]) or _offset(f[7])),
+            Z=('%s', 8),
+        )
+        if nth:
+            emitters['d'] = ('%s', lambda f: _nth(f[2]))
+        template = []
+        getters = []
+        micro = []
+        other = ''
+        self.second = '\0' not in spec
+        i = 0
+        while i < len(spec):
+            c = spec[i]
+            i += 1
+            if c != '%':
+                if other:
+                    other += c
+                else:
+                    template.append('%%' if c == '%' else c)
+                continue
+            j = i
+            while j < len(spec) and spec[j] in '-_0^#123456789EO':
+                j += 1
+            directive = spec[i - 1:j + 1]
+            flags = j > i
+            i = j + 1
+            if directive == '%%' and not other:
+                template.append('%%')
+            elif not flags and directive[1:] in emitters:
+                if other:
+                    template.append('%s')
+                    getters.append(self._other(other))
+                    other = ''
+                if directive == '%f':
+                    micro.append(len(getters))
+                template.append(emitters[directive[1:]][0])
+                getters.append(emitters[directive[1:]][1])
+            else:
+                if directive[-1] == 'f':
+                    self.second = False
+                other += directive
+        if other:
+            template.append('%s')
+            getters.append(self._other(other))
+        self.strftime = any(getattr(g, '__name__', '') == 'emitter' \
+            for g in getters)
+        self.template = ''.join(template)
+        self.getters = getters
+        self._get = None
+        if all(isinstance(g, int) for g in getters):
+            self._get = operator.itemgetter(*getters) if getters else \
+                (lambda f: ())
+        elif any(isinstance(g, int) for g in getters):
+            self.getters = [operator.itemgetter(g) if isinstance(g, int) \
+                else g for g in getters]
+        self.micro = len(micro)
+        if micro:
+            getters = list(getters)
+            for k in micro:
+                template[template.index('%06d')] = '%s'
+                getters[k] = lambda f: '\0'
+            self._split_template = ''.join(template)
+            self._split_getters = [operator.itemgetter(g) \
+                if isinstance(g, int) else g for g in getters]
+
+    @staticmethod
+    def _other(spec):
+        """Returns an emitter passing ``spec`` to ``strftime``"""
+        def emitter(f):
+            d = f[9]
+            if d == None:
+                d = datetime.datetime(*f[:7])
+            return d.strftime(spec)
+        return emitter
+
+    def render(self, f):
+        """Returns the fields tuple ``f`` as a string"""
+        if self._get != None:
+            return self.template % self._get(f)
+        return self.template % tuple([g(f) for g in self.getters])
+
+    def split(self, f):
+        """Returns the fields tuple ``f`` as a list of strings to be
+        joined by the zero-padded microsecond, one more than the number
+        of ``%f`` directives; only valid if ``second`` is True"""
+        if not self.micro:
+            return [self.render(f)]
+        return (self._split_template % tuple([g(f) \
+            for g in self._split_getters])).split('\0')
+
+class _zone(object):
+    """UTC transition table of a pytz timezone
+
+    The UTC epoch seconds at which the UTC offset, DST flag, or name of
+    the timezone changes are extracted once from pytz into a sorted
+    list, so that converting between UTC and local time is a ``bisect``
+    that gives the same results as pytz (``fromutc`` and ``localize``)
+    without creating datetime objects. ``array`` returns the table as
+    NumPy arrays for ``numpy.searchsorted``.
+    """
+
+    _cache = _lru(256)
+
+    @classmethod
+    def compile(cls, tz):
+        """Returns the cached table for the pytz timezone ``tz``,
+        extracting it on first use"""
+        r = cls._cache.get(tz)
+        if r == None:
+            r = cls._cache.setdefault(tz, cls(tz))
+        return r
+
+    def __init__(self, tz):
+        times = getattr(tz, '_utc_transition_times', None)
+        if times:
+            self.times = [_timegm(t.timetuple()) for t in times]
+            self.info = [(_seconds(o), bool(d), n) \
+                for o, d, n in tz._transition_info]
+        else:
+            d = datetime.datetime(2000, 1, 1)
+            self.times = [_timegm(datetime.datetime.min.timetuple())]
+            self.info = [(_seconds(tz.utcoffset(d)), False, tz.tzname(d))]
+        self.offsets = [i[0] for i in self.info]
+        self.days = {}
+        self._array = None
+
+    def array(self):
+        """Returns the transition times and UTC offsets as NumPy int64
+        arrays"""
+        if self._array == None:
+            self._array = (numpy.array(self.times, dtype=numpy.int64), \
+                numpy.array(self.offsets, dtype=numpy.int64))
+        return self._array
+
+    def local(self, utc):
+        """Returns the ``(offset, dst, name)`` in effect at the int UTC
+        epoch seconds ``utc``, as ``fromutc``"""
+        i = bisect.bisect_right(self.times, utc) - 1
+        return self.info[i if i > 0 else 0]
+
+    def offset(self, utc):
+        """Returns the UTC offset seconds in effect at the int UTC epoch
+        seconds ``utc``"""
+        i = bisect.bisect_right(self.times, utc) - 1
+        return self.offsets[i if i > 0 else 0]
+
+    def utc(self, local, dst='standard'):
+        """Returns int UTC epoch seconds for the int local epoch seconds
+        ``local``, as ``localize``
+
+        ``dst`` is the policy for local times that do not exist (in the
+        gap when clocks go forward) or are ambiguous (in the overlap
+        when clocks go back): 'standard' resolves them as standard
+        time, like ``localize`` with its default ``is_dst=False``,
+        'daylight' as daylight saving time, and 'raise' raises
+        ``TimeNonexistentError`` or ``TimeAmbiguousError``.
+        """
+        day = local // 86400
+        o = self.days.get(day)
+        if o == None:
+            # the offset of a local day without transitions around it
+            i = bisect.bisect_right(self.times, (day - 2) * 86400)
+            if i == bisect.bisect_right(self.times, (day + 3) * 86400):
+                o = self.offsets[i - 1 if i > 0 else 0]
+            else:
+                o = False
+            self.days[day] = o
+        if o is not False:
+            return local - o
+        r = []
+        for i in (local - 86400, local + 86400):
+            o = self.offset(i)
+            if self.offset(local - o) == o and not local - o in r:
+                r.append(local - o)
+        if len(r) == 1:
+            return r[0]
+        elif r == []:
+            if dst == 'standard':
+                return self.utc(local - 21600, dst) + 21600
+            elif dst == 'daylight':
+                return self.utc(local + 21600, dst) - 21600
+            raise TimeNonexistentError('local time does not exist')
+        elif dst == 'raise':
+            raise TimeAmbiguousError('local time is ambiguous')
+        f = [i for i in r if self.local(i)[1] == (dst == 'daylight')]
+        if len(f) == 1:
+            return f[0]
+        # same DST flag on both sides: earliest if 'daylight', else latest
+        return min(r) if dst == 'daylight' else max(r)
+
+    def fields(self, us, info=None):
+        """Returns the fields tuple used by format plans for int UTC
+        epoch microseconds ``us``, via integer arithmetic only; ``info``
+        is the ``(offset, dst, name)`` in effect, if already known"""
+        s, us = divmod(us, 10**6)
+        o, dst, name = info or self.local(s)
+        days, s = divmod(s + o, 86400)
+        y, m, d = _civil(days)
+        h, s = divmod(s, 3600)
+        return (y, m, d, h, s // 60, s % 60, us, o, name, None)
+
+    def fields_array(self, us):
+        """Returns a list of the fields tuples used by format plans for
+        a NumPy int64 array of UTC epoch microseconds ``us``, computed
+        via vectorized integer arithmetic"""
+        times, offsets = self.array()
+        s, us = numpy.divmod(us, 10**6)
+        i = numpy.maximum(numpy.searchsorted(times, s, 'right') - 1, 0)
+        o = offsets[i]
+        days, s = numpy.divmod(s + o, 86400)
+        y, m, d = _civil_array(days)
+        h, s = numpy.divmod(s, 3600)
+        m_, s = numpy.divmod(s, 60)
+        names = [self.info[j][2] for j in i.tolist()]
+        columns = [c.tolist() for c in (y, m, d, h, m_, s, us, o)]
+        return [f + (n, None) for f, n in zip(zip(*columns), names)]
+
 class _bdict(dict):
     """Enhanced dictionary used to store the formats"""
 
@@ -200,6 +1080,177 @@ class _bdict(dict):
             key = 'base'
         return self[key] if key in self else key
 
+class statistics(object):
+    """Opt-in statistics of kron calls, available as ``kron.stats``
+
+    While enabled (via ``enable_stats`` or the ``KRON_STATS``
+    environment variable set to anything but ``0`` at import), the
+    following are replaced with wrappers that record the number of
+    calls, errors, and latencies in seconds; disabled, the original
+    functions are restored, so there is no cost.
+
+    * ``parse_many``, ``time``, ``time_ntp``, ``time_utc``,
+      ``timestamp.str``, and ``timezone.search``
+    * ``timezone``: construction of a timezone not in the cache
+    * ``ntp_query``: NTP requests not answered from the cached offset
+
+    Counters record ``strptime`` parses, ``tzlocal`` probes, and
+    ``time_ntp_fallback`` (``time(ntp=True)`` falling back to the system
+    clock). Percentiles are computed over the latencies of the most
+    recent ``size`` calls. Functions imported via ``from kron import
+    ...`` before enabling are not instrumented.
+
+    ``snapshot`` returns plain dictionaries to export to a metrics
+    system, including the hit rates of the internal caches; ``reset``
+    starts over.
+    """
+
+    size = 1024
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._originals = []
+        self.reset()
+
+    def enable(self):
+        """Starts recording"""
+        with self._lock:
+            if self.enabled:
+                return
+            for name, owner, attr in self._targets():
+                f = vars(owner)[attr]
+                self._originals.append((owner, attr, f))
+                if isinstance(f, classmethod):
+                    w = classmethod(self._wrap(name, f.__func__))
+                else:
+                    w = self._wrap(name, f)
+                setattr(owner, attr, w)
+            self.enabled = True
+
+    def disable(self):
+        """Stops recording and restores the original functions"""
+        with self._lock:
+            for owner, attr, f in self._originals:
+                setattr(owner, attr, f)
+            self._originals = []
+            self.enabled = False
+
+    def reset(self):
+        """Discards the recorded statistics and resets the cache
+        counters"""
+        with self._lock:
+            self._calls = {}
+            self._counters = {}
+            self._since = _time.time()
+        for c in self._caches().values():
+            c.reset()
+
+    def count(self, name, n=1):
+        """Adds ``n`` to the counter ``name`` if enabled"""
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self):
+        """Returns the statistics as a dictionary
+
+        * ``enabled``: bool
+        * ``since``: float epoch seconds of the last reset
+        * ``calls``: dictionary of name to ``count``, ``errors``,
+          ``total``, ``min``, ``max``, ``mean``, ``p50``, ``p90``, and
+          ``p99``, with latencies in seconds
+        * ``counters``: dictionary of name to int
+        * ``caches``: dictionary of name to ``hits``, ``misses``,
+          ``evictions``, ``size``, ``maxsize``, and ``hit_rate`` (None
+          if unused)
+        """
+        with self._lock:
+            calls = {}
+            for name, c in self._calls.items():
+                count, errors, total, low, high, samples = c
+                v = sorted(samples)
+                calls[name] = dict(count=count, errors=errors, total=total,
+                    min=low, max=high, mean=total / count,
+                    p50=self._percentile(v, 50),
+                    p90=self._percentile(v, 90),
+                    p99=self._percentile(v, 99))
+            r = dict(enabled=self.enabled, since=self._since, calls=calls,
+                counters=dict(self._counters))
+        caches = {}
+        for name, c in self._caches().items():
+            i = c.info()
+            n = i['hits'] + i['misses']
+            i['hit_rate'] = i['hits'] / n if n else None
+            caches[name] = i
+        r['caches'] = caches
+        return r
+
+    def _record(self, name, seconds, error):
+        with self._lock:
+            c = self._calls.get(name)
+            if c == None:
+                c = self._calls[name] = [0, 0, 0.0, seconds, seconds, []]
+            if len(c[5]) < self.size:
+                c[5].append(seconds)
+            else:
+                c[5][c[0] % self.size] = seconds
+            c[0] += 1
+            c[1] += error
+            c[2] += seconds
+            if seconds < c[3]:
+                c[3] = seconds
+            if seconds > c[4]:
+                c[4] = seconds
+
+    def _wrap(self, name, f):
+        """Returns ``f`` wrapped to record its calls as ``name``"""
+        record = self._record
+        def wrapper(*args, **kwargs):
+            start = _perf_counter()
+            error = True
+            try:
+                r = f(*args, **kwargs)
+                error = False
+                return r
+            finally:
+                record(name, _perf_counter() - start, error)
+        wrapper.__name__ = f.__name__
+        wrapper.__doc__ = f.__doc__
+        wrapper.__wrapped__ = f
+        return wrapper
+
+    @staticmethod
+    def _percentile(v, p):
+        """Returns the ``p`` percentile of the sorted list ``v``
+        (nearest rank)"""
+        if not v:
+            return None
+        return v[max(0, (len(v) * p + 99) // 100 - 1)]
+
+    @staticmethod
+    def _caches():
+        """Returns the internal caches by name"""
+        r = dict(parser=_parser._cache, plan=_plan._cache,
+            strings=timestamp._strings, timezone=timezone._cache,
+            zone=_zone._cache)
+        if timezone._index != None:
+            r['timezone.search'] = timezone._index.patterns
+        return r
+
+    @staticmethod
+    def _targets():
+        """Returns the (name, owner, attribute) of the instrumented
+        functions"""
+        import sys
+        m = sys.modules[__name__]
+        return [('ntp_query', m, '_ntp_query'),
+            ('parse_many', m, 'parse_many'), ('time', m, 'time'),
+            ('time_ntp', m, 'time_ntp'), ('time_utc', m, 'time_utc'),
+            ('timestamp.str', timestamp, 'str'),
+            ('timezone', timezone, '_resolve'),
+            ('timezone.search', timezone, 'search')]
+
 class timestamp(object):
     """Represents a specific point in time
     
@@ -210,12 +1261,27 @@ class timestamp(object):
     * Anything else is passed to the ``time`` function along with the
       values of the ``tz``, ``fmt``, and ``ntp`` arguments
 
-    Internal storage is float epoch seconds in UTC and accessible via
-    the ``value`` property.
+    Internal storage is int epoch nanoseconds in UTC, so arithmetic and
+    comparisons are exact; the ``ns`` and ``us`` properties return int
+    epoch nanoseconds and microseconds and the ``value`` property
+    returns float epoch seconds. Int/float seconds and times parsed by
+    ``time`` are rounded to whole microseconds as always; use
+    ``timestamp.from_ns`` for nanosecond precision. Formatting and
+    ``timestamp_array`` use whole microseconds.
+
+    Timestamp objects use ``__slots__``; each takes 40 bytes for the
+    object plus its int of epoch nanoseconds on 64-bit CPython 3.11: 76
+    bytes for dates after mid-2006 or before mid-1933 (36-byte int) and
+    72 bytes in between, compared to about 110 bytes for an object with
+    an instance dictionary holding a float.
 
     Timestamp objects can be compared via ``<``, ``>``, ``<=``, ``>=``,
     ``==``, and ``!=`` with each other.
 
+    Timestamp objects are hashable, consistent with ``==``, so they
+    can be used in sets, as dict keys, and as ``functools.lru_cache``
+    arguments.
+
     Timestamp objects support various arithmetic operations via ``+``
     and ``-``.
 
@@ -294,68 +1360,133 @@ class timestamp(object):
         yyyymmdd='%Y%m%d',
     )
 
+    __slots__ = ('_ns',)
+
+    _number = re.compile(r'^\d+\.?\d*$')
+    _strings = _lru(1024)
+
     def __init__(self, value=None, tz=None, fmt=None, ntp=False):
         if isinstance(value, (int, float)):
-            self.value = float(value)
-        elif isinstance(value, str) and \
-        re.search(r'^\d+\.?\d*$', value):
-            self.value = float(value)
+            self._ns = _nanos(value)
+        elif value is None and tz is None and fmt is None and not ntp:
+            self._ns = _time_ns()
+        elif isinstance(value, str) and fmt == 'iso8601':
+            self._ns = _isoparser.ns(value)
+        elif isinstance(value, str) and self._number.search(value):
+            self._ns = _nanos(float(value))
         else:
-            self.value = time(value, tz, fmt, ntp)
-        self.value = round(self.value, 6)
+            self._ns = _nanos(time(value, tz, fmt, ntp))
+
+    @classmethod
+    def from_ns(cls, ns):
+        """Returns a new object for int epoch nanoseconds ``ns`` in UTC,
+        such as from ``time.time_ns()``"""
+        return cls._from_ns(int(ns))
+
+    @classmethod
+    def from_datetime(cls, d, tz=None, dst='standard'):
+        """Returns a new object for the ``datetime.datetime`` ``d``,
+        exactly; a naive ``d`` is in the local or given timezone, with
+        ``dst`` as in ``time_utc``"""
+        return cls._from_micros(_utc_micros(d, tz, dst))
+
+    @classmethod
+    def _from_ns(cls, ns):
+        """Returns a new object for int epoch nanoseconds ``ns``
+        without validation"""
+        r = object.__new__(cls)
+        r._ns = ns
+        return r
+
+    @classmethod
+    def _from_micros(cls, us):
+        """Returns a new object for int epoch microseconds ``us``
+        without validation"""
+        r = object.__new__(cls)
+        r._ns = us * 1000
+        return r
+
+    @property
+    def ns(self):
+        """Int epoch nanoseconds in UTC"""
+        return self._ns
+
+    @property
+    def us(self):
+        """Int epoch microseconds in UTC (floor)"""
+        return self._ns // 1000
+
+    @property
+    def value(self):
+        """Float epoch seconds in UTC"""
+        return self._ns / 10**9
+
+    @value.setter
+    def value(self, value):
+        self._ns = _nanos(value)
 
     def __cmp__(self, y):
         """Compare two timestamps"""
         if isinstance(y, timestamp):
-            return cmp(self.value, y.value)
+            return (self._ns > y._ns) - (self._ns < y._ns)
         else:
             raise TimestampComparisonError
 
     def __lt__(self, y):
         """Compare two timestamps via < (Python 3)"""
         if isinstance(y, timestamp):
-            return self.value < y.value
+            return self._ns < y._ns
         else:
             raise TimestampComparisonError
 
     def __le__(self, y):
         """Compare two timestamps via <= (Python 3)"""
         if isinstance(y, timestamp):
-            return self.value <= y.value
+            return self._ns <= y._ns
         else:
             raise TimestampComparisonError
 
     def __gt__(self, y):
         """Compare two timestamps via > (Python 3)"""
         if isinstance(y, timestamp):
-            return self.value > y.value
+            return self._ns > y._ns
         else:
             raise TimestampComparisonError
 
     def __ge__(self, y):
         """Compare two timestamps via >= (Python 3)"""
         if isinstance(y, timestamp):
-            return self.value >= y.value
+            return self._ns >= y._ns
         else:
             raise TimestampComparisonError
 
     def __eq__(self, y):
         """Compare two timestamps via == (Python 3)"""
         if isinstance(y, timestamp):
-            return self.value == y.value
+            return self._ns == y._ns
         else:
             raise TimestampComparisonError
 
+    def __ne__(self, y):
+        """Compare two timestamps via != (Python 3)"""
+        return not self.__eq__(y)
+
+    def __hash__(self):
+        """Hash consistent with ``==``; the type is mixed in so that
+        timestamps rarely collide with int/float keys, which they never
+        equal"""
+        return hash((timestamp, self._ns))
+
     def __sub__(self, y):
         """Subtract two timestamps to produce a duration object, or a
         duration, int, or float from a timestamp to produce a new
         timestamp object"""
         if isinstance(y, timestamp):
-            return duration(abs(self.value - y.value))
+            return duration._from_ns(abs(self._ns - y._ns))
         elif isinstance(y, duration):
-            return timestamp(self.value - y.value)
+            return timestamp._from_ns(self._ns - y._ns)
         elif isinstance(y, (int, float)):
-            return timestamp(self.value - y)
+            return timestamp._from_ns(self._ns - _nanos(y))
         else:
             raise TimestampSubtractError
 
@@ -363,9 +1494,9 @@ class timestamp(object):
         """Add a duration, int, or float to a timestamp to produce a
         new timestamp object"""
         if isinstance(y, duration):
-            return timestamp(self.value + y.value)
+            return timestamp._from_ns(self._ns + y._ns)
         elif isinstance(y, (int, float)):
-            return timestamp(self.value + y)
+            return timestamp._from_ns(self._ns + _nanos(y))
         else:
             raise TimestampAddError
 
@@ -387,27 +1518,81 @@ class timestamp(object):
 
     def str(self, tz=None, fmt=None):
         """Returns the timestamp as a string in the local or given
-        timezone and the 'basetz' or given format"""
-        d = datetime.datetime.fromtimestamp(self.value)
-        d = timezone().pytz.localize(d)
+        timezone and the 'basetz' or given format
+
+        Strings are cached per whole second, timezone, and format string
+        (not name, so changes to ``formats`` take effect at once), so
+        that repeated calls within the same second (log lines, HTTP
+        ``Date`` headers) only splice in the microseconds for ``%f``.
+        """
         if fmt == 'iso8601':
             tz = 'UTC'
-        if tz != pytz.utc:
+        us = self._ns // 1000
+        key = (us // 10**6, tz) + self._spec(fmt)
+        r = self._strings.get(key)
+        if r == None:
+            p = _plan.compile(*key[2:])
+            f = self._local_fields(tz, p.strftime)
+            if not p.second:
+                return p.render(f)
+            r = p.split(f)
+            self._strings.put(key, r)
+        if len(r) == 1:
+            return r[0]
+        return ('%06d' % (us % 10**6)).join(r)
+
+    def _local_fields(self, tz=None, strftime=False):
+        """Returns the fields tuple used by format plans in the local or
+        given timezone, from the transition table of the timezone or,
+        if ``strftime`` is True, from an aware datetime; ``tz`` can
+        also be a pytz timezone object"""
+        if strftime:
+            return _fields(self._localtime(tz))
+        if not isinstance(tz, datetime.tzinfo):
             tz = timezone(tz).pytz
-            d = tz.normalize(d.astimezone(tz))
+        return _zone.compile(tz).fields(self._ns // 1000)
+
+    def _localtime(self, tz=None):
+        """Returns the timestamp as a datetime in the local or given
+        timezone; ``tz`` can also be a pytz timezone object"""
+        if not isinstance(tz, datetime.tzinfo):
+            tz = timezone(tz).pytz
+        return _datetime(self._ns // 1000, tz)
+
+    _nth_formats = dict(
+        Month_Nth='%B %d',
+        Month_Nth_YYYY='%B %d, %Y',
+        Day_Month_Nth='%A, %B %d',
+        Day_Month_Nth_YYYY='%A, %B %d, %Y',
+    )
+
+    @classmethod
+    def register_format(cls, name, fmt):
+        """Adds or replaces the named format ``name`` with the
+        ``strftime`` format string ``fmt`` and compiles it"""
+        _plan.compile(fmt)
+        cls.formats[name] = fmt
+
+    @classmethod
+    def _plan(cls, fmt=None):
+        """Returns the compiled plan for the 'basetz' or given format"""
+        return _plan.compile(*cls._spec(fmt))
+
+    @classmethod
+    def _spec(cls, fmt=None):
+        """Returns the ``strftime`` format string of the 'basetz' or
+        given format and whether ``%d`` is ordinal, as ``(spec, nth)``"""
         if fmt == None:
             fmt = 'basetz'
-        if fmt == 'Month_Nth':
-            r = d.strftime('%%B %s' % _nth(d.strftime('%d')))
-        elif fmt == 'Month_Nth_YYYY':
-            r = d.strftime('%%B %s, %%Y' % _nth(d.strftime('%d')))
-        elif fmt == 'Day_Month_Nth':
-            r = d.strftime('%%A, %%B %s' % _nth(d.strftime('%d')))
-        elif fmt == 'Day_Month_Nth_YYYY':
-            r = d.strftime('%%A, %%B %s, %%Y' % _nth(d.strftime('%d')))
-        else:
-            r = d.strftime(self.formats[fmt])
-        return r
+        if fmt in cls._nth_formats:
+            return (cls._nth_formats[fmt], True)
+        return (cls.formats.get(fmt, fmt), False)
+
+    @classmethod
+    def _format(cls, d, fmt=None):
+        """Returns the datetime ``d`` as a string in the 'basetz' or
+        given format"""
+        return cls._plan(fmt).render(_fields(d))
 
     def utc(self, fmt='basetz'):
         """Returns the timestamp as a string in the UTC timezone and
@@ -424,32 +1609,247 @@ class timestamp(object):
         (implied) and the 'iso8601' format"""
         return self.str(fmt='iso8601')
 
+    def to_datetime(self, tz=None):
+        """Returns the timestamp as an aware ``datetime.datetime`` in the
+        local or given timezone, truncated to whole microseconds
+        (floor); ``tz`` can also be a pytz timezone object"""
+        return self._localtime(tz)
+
     def dict(self, tz=[None], fmt=['basetz']):
         """Returns the timestamp as a dictionary with keys as the
         given timezones and values as dictionaries with keys as the
-        given formats (default: 'basetz')"""
+        given formats (default: 'basetz')
+
+        The timestamp is converted once per timezone and all formats
+        are rendered from that conversion.
+        """
         if fmt == 'all' or isinstance(fmt, list) and 'all' in fmt:
             fmt = list(self.formats.keys())
         if not isinstance(tz, list):
             tz = [tz]
         if not isinstance(fmt, list):
             fmt = [fmt]
-        r = {}
-        for t in tz:
-            if t == None:
-                t = 'localtz'
-            r[t] = {}
-            for f in fmt:
-                if f == None:
-                    f = 'basetz'
-                r[t][f] = self.str(t if t != 'localtz' else None, f)
-        return r
+        plans = [(f if f != None else 'basetz', self._plan(f)) for f in fmt]
+        strftime = any(p.strftime for k, p in plans)
+        utc = []
+        def render(t):
+            f = self._local_fields(t if t != 'localtz' else None, strftime)
+            r = {}
+            for k, p in plans:
+                if k == 'iso8601':
+                    if not utc:
+                        utc.append(self._local_fields('UTC', strftime))
+                    r[k] = p.render(utc[0])
+                else:
+                    r[k] = p.render(f)
+            return r
+        tz = [t if t != None else 'localtz' for t in tz]
+        return dict((t, render(t)) for t in tz)
 
     def json(self, tz=[None], fmt=['basetz']):
         """Returns the dictionary produced by the ``dict`` method as a
         pretty-printed JSON string"""
         return _json(self.dict(tz, fmt))
 
+class timestamp_array(object):
+    """Represents an array of specific points in time
+
+    ``values`` can be a sequence or NumPy array of int/float epoch
+    seconds in UTC or ``timestamp`` objects, a NumPy ``datetime64``
+    array (UTC), or another ``timestamp_array``.
+
+    Internal storage is a NumPy int64 array of epoch microseconds in
+    UTC and accessible via the ``us`` property; the ``values`` property
+    returns float epoch seconds, and ``to_datetime64`` a
+    ``datetime64[us]`` view of the same buffer.
+
+    Requires NumPy, which is an optional dependency (``pip install
+    kron[numpy]``); raises ``NumpyMissingError`` if it is not
+    installed.
+
+    Indexing with an int returns a ``timestamp``; indexing with a slice
+    or NumPy index array returns a ``timestamp_array``.
+
+    Timestamp array objects can be compared via ``<``, ``>``, ``<=``,
+    ``>=``, ``==``, and ``!=`` with a timestamp or a timestamp array of
+    the same length, producing a NumPy bool array.
+
+    Timestamp array objects support various element-wise arithmetic
+    operations via ``+`` and ``-``.
+
+    +----------+----------------------------+-----------------+
+    | Operator | Other type                 | Returned type   |
+    +==========+============================+=================+
+    | ``+``    | int, float, duration,      | timestamp_array |
+    |          | NumPy array of seconds or  |                 |
+    |          | ``timedelta64``            |                 |
+    +----------+----------------------------+-----------------+
+    | ``-``    | int, float, duration,      | timestamp_array |
+    |          | NumPy array of seconds or  |                 |
+    |          | ``timedelta64``            |                 |
+    +          +----------------------------+-----------------+
+    |          | timestamp, timestamp_array | NumPy array of  |
+    |          |                            | float seconds   |
+    +----------+----------------------------+-----------------+
+
+    Subtracting timestamps produces absolute differences, as with
+    ``duration`` objects.
+
+    Arithmetic operations with a type not listed in the above table
+    raises ``TimestampAddError`` or ``TimestampSubtractError``, and
+    comparison with any other type raises ``TimestampComparisonError``.
+    """
+
+    __hash__ = None
+
+    def __init__(self, values=()):
+        _numpy()
+        if isinstance(values, timestamp_array):
+            self.us = values.us.copy()
+            return
+        if not isinstance(values, numpy.ndarray):
+            values = list(values)
+            if any(isinstance(i, timestamp) for i in values):
+                self.us = numpy.array([i._ns // 1000 \
+                    if isinstance(i, timestamp) else _micros(i) \
+                    for i in values], dtype=numpy.int64)
+                return
+            values = numpy.array(values)
+        if values.dtype.kind == 'M':
+            self.us = values.astype('datetime64[us]').view(numpy.int64)
+            return
+        self.us = _micros_array(values)
+
+    @classmethod
+    def from_datetime64(cls, values):
+        """Returns a new object for the NumPy ``datetime64`` array
+        ``values`` (UTC), sharing its buffer if it is
+        ``datetime64[us]``"""
+        _numpy()
+        if values.dtype != numpy.dtype('datetime64[us]'):
+            values = values.astype('datetime64[us]')
+        return cls._from_micros(values.view(numpy.int64))
+
+    @classmethod
+    def _from_micros(cls, us):
+        """Returns a new object wrapping the int64 array ``us``
+        without copying or validation"""
+        r = cls.__new__(cls)
+        r.us = us
+        return r
+
+    @property
+    def values(self):
+        """NumPy array of float epoch seconds in UTC"""
+        return self.us / 1e6
+
+    def to_datetime64(self):
+        """Returns a NumPy ``datetime64[us]`` view of the timestamps
+        (UTC), sharing the buffer of ``us``"""
+        return self.us.view('datetime64[us]')
+
+    def __len__(self):
+        return len(self.us)
+
+    def __iter__(self):
+        for i in self.us.tolist():
+            yield timestamp._from_micros(i)
+
+    def __getitem__(self, i):
+        r = self.us[i]
+        if isinstance(r, numpy.ndarray):
+            return self._from_micros(r)
+        return timestamp._from_micros(int(r))
+
+    def _other(self, y, error):
+        """Returns ``y`` as epoch or duration microseconds, or raises
+        ``error``"""
+        if isinstance(y, (timestamp, duration)):
+            return y._ns // 1000
+        elif isinstance(y, timestamp_array):
+            return y.us
+        elif isinstance(y, (int, float)) and not isinstance(y, bool):
+            return _micros(y)
+        elif isinstance(y, numpy.ndarray) and y.dtype.kind in 'iuf':
+            return _micros_array(y)
+        elif isinstance(y, numpy.ndarray) and y.dtype.kind == 'm':
+            return y.astype('timedelta64[us]').view(numpy.int64)
+        raise error
+
+    def __add__(self, y):
+        """Add a duration, int, float, or NumPy array of seconds to
+        each timestamp to produce a new timestamp array"""
+        if isinstance(y, (timestamp, timestamp_array)):
+            raise TimestampAddError
+        return self._from_micros(self.us + self._other(y, TimestampAddError))
+
+    __radd__ = __add__
+
+    def __sub__(self, y):
+        """Subtract a timestamp or timestamp array to produce a NumPy
+        array of float seconds, or a duration, int, float, or NumPy
+        array of seconds to produce a new timestamp array"""
+        us = self._other(y, TimestampSubtractError)
+        if isinstance(y, (timestamp, timestamp_array)):
+            return numpy.abs(self.us - us) / 1e6
+        return self._from_micros(self.us - us)
+
+    def _compare(self, y):
+        if not isinstance(y, (timestamp, timestamp_array)):
+            raise TimestampComparisonError
+        return self._other(y, TimestampComparisonError)
+
+    def __lt__(self, y):
+        return self.us < self._compare(y)
+
+    def __le__(self, y):
+        return self.us <= self._compare(y)
+
+    def __gt__(self, y):
+        return self.us > self._compare(y)
+
+    def __ge__(self, y):
+        return self.us >= self._compare(y)
+
+    def __eq__(self, y):
+        return self.us == self._compare(y)
+
+    def __ne__(self, y):
+        return self.us != self._compare(y)
+
+    def min(self):
+        """Returns the earliest timestamp"""
+        return timestamp._from_micros(int(self.us.min()))
+
+    def max(self):
+        """Returns the latest timestamp"""
+        return timestamp._from_micros(int(self.us.max()))
+
+    def argsort(self):
+        """Returns the NumPy array of indices that sorts the array"""
+        return self.us.argsort(kind='stable')
+
+    def str(self, tz=None, fmt=None):
+        """Returns a list with each timestamp as a string in the local
+        or given timezone and the 'basetz' or given format, as
+        ``timestamp.str``
+
+        The timezone is resolved once, the UTC offsets are looked up in
+        its transition table via ``numpy.searchsorted``, the dates and
+        times are computed with vectorized integer arithmetic, and each
+        distinct value is only converted and formatted once.
+        """
+        if fmt == 'iso8601':
+            tz = 'UTC'
+        z = timezone(tz).pytz
+        p = timestamp._plan(fmt)
+        u, inverse = numpy.unique(self.us, return_inverse=True)
+        if p.strftime:
+            s = [p.render(_fields(_datetime(i, z))) for i in u.tolist()]
+        else:
+            s = [p.render(f) for f in _zone.compile(z).fields_array(u)]
+        return [s[i] for i in inverse.ravel().tolist()]
+
 class timezone(object):
     """Represent a timezone
 
@@ -459,18 +1859,69 @@ class timezone(object):
 
     A pytz object is created for the given name and accessible via the
     ``pytz`` property.
+
+    Timezone objects are immutable and interned: ``timezone(name)``
+    returns a shared instance from a bounded least recently used cache
+    keyed on ``name``, so the search and pytz lookup only run the first
+    time a given name is used. See ``cache_info``, ``cache_clear``, and
+    ``cache_resize``.
     """
 
-    def __init__(self, name=None):
-        self.original = name
-        self.name = self.search(name)
-        if isinstance(self.name, list):
-            if len(self.name) == 0:
+    __slots__ = ('_original', '_name', '_pytz')
+
+    _cache = _lru(256)
+    _index = None
+
+    def __new__(cls, name=None):
+        r = cls._cache.get(name)
+        if r is None:
+            r = object.__new__(cls)
+            r._resolve(name)
+            r = cls._cache.setdefault(name, r)
+        return r
+
+    def _resolve(self, name):
+        """Resolve ``name`` and populate a new instance"""
+        self._original = name
+        self._name = self.search(name)
+        if isinstance(self._name, list):
+            if len(self._name) == 0:
                 raise TimezoneFailure('No timezone found for "%s"' % name)
             else:
                 raise TimezoneMultiple('Found multiple possible timezones' + \
-                    ' for "%s": %s' % (name, ', '.join(self.name)))
-        self.pytz = pytz.timezone(self.name)
+                    ' for "%s": %s' % (name, ', '.join(self._name)))
+        self._pytz = pytz.timezone(self._name)
+
+    @property
+    def original(self):
+        """Name as given to the constructor"""
+        return self._original
+
+    @property
+    def name(self):
+        """Resolved timezone name"""
+        return self._name
+
+    @property
+    def pytz(self):
+        """pytz timezone object"""
+        return self._pytz
+
+    @classmethod
+    def cache_info(cls):
+        """Returns a dictionary with the hits, misses, evictions, size,
+        and maxsize of the timezone cache"""
+        return cls._cache.info()
+
+    @classmethod
+    def cache_clear(cls):
+        """Empties the timezone cache and resets its counters"""
+        cls._cache.clear()
+
+    @classmethod
+    def cache_resize(cls, maxsize):
+        """Sets the maximum number of timezones kept in the cache"""
+        cls._cache.resize(maxsize)
 
     @classmethod
     def search(cls, name=None):
@@ -479,7 +1930,8 @@ class timezone(object):
         ``name`` can be:
 
         * omitted or None: returns name of the local timezone via
-          tzlocal or UTC
+          tzlocal or UTC; detected once and cached, see
+          ``local_timezone``
         * string matching a timezone name in ``pytz.all_timezones``:
           returns the timezone name in proper case
         * empty string ('') or wildcard regular expression ('.*'):
@@ -488,24 +1940,15 @@ class timezone(object):
           zero matches returns a list with the matched timezone names
         """
         if name == None:
-            try:
-                return tzlocal.get_localzone().zone
-            except:
-                return 'UTC'
-        if name in pytz.all_timezones:
-            return name
-        name_ = name.lower()
-        matches = []
-        for t in pytz.all_timezones:
-            t_ = t.lower()
-            if name_ == t_:
-                return t
-            if re.search(name, t) or re.search(name_, t_):
-                matches.append(t)
-        if len(matches) == 1:
-            return matches[0]
-        else:
-            return matches
+            return _local_timezone_name()
+        return cls._search_index().search(name)
+
+    @classmethod
+    def _search_index(cls):
+        """Returns the search index, creating it on first use"""
+        if cls._index is None:
+            cls._index = _tzindex(pytz.all_timezones)
+        return cls._index
 
 # Error classes
 
@@ -531,12 +1974,24 @@ class DurationSubtractError(KronError):
 class NTPError(KronError):
     pass
 
+class NTPTimeoutError(NTPError):
+    pass
+
+class NumpyMissingError(KronError):
+    pass
+
+class TimeAmbiguousError(KronError):
+    pass
+
 class TimeEpochError(KronError):
     pass
 
 class TimeFormatError(KronError):
     pass
 
+class TimeNonexistentError(KronError):
+    pass
+
 class TimeTimezoneError(KronError):
     pass
 
@@ -563,6 +2018,135 @@ class TimezoneMultiple(KronError):
 
 # Functions
 
+def add_ntp_hook(hook):
+    """Adds the function ``hook``, called with the ``ntp_sample`` of
+    each NTP query as it completes (from the querying thread, or the
+    event loop for ``kron.aio``); exceptions it raises are ignored"""
+    _ntp_hooks.append(hook)
+
+def coarse_clock(tick=None):
+    """Returns the shared ``clock`` used by ``now(coarse=True)``,
+    starting it with a ``tick`` of 0.001 seconds (1 ms) on first use;
+    a given ``tick`` replaces the current one"""
+    global _clock
+    with _clock_lock:
+        if _clock == None:
+            _clock = clock(tick or 0.001)
+        elif tick != None:
+            _clock.tick = tick
+    return _clock
+
+def disable_stats():
+    """Stops recording ``kron.stats``"""
+    stats.disable()
+
+def enable_stats():
+    """Starts recording ``kron.stats``"""
+    stats.enable()
+
+def local_timezone(check=False):
+    """Returns the ``timezone`` object for the local timezone
+
+    The local timezone is detected via tzlocal the first time it is
+    needed and cached for the life of the process.
+
+    If ``check`` is True, the ``TZ`` environment variable and the
+    modification time of ``/etc/localtime`` are compared with their
+    values at detection time, and the local timezone is detected again
+    if either changed; long-running processes can call this
+    periodically to follow changes to the host timezone.
+    """
+    if check and _local_stamp() != _local['stamp']:
+        return refresh_local_timezone()
+    return timezone()
+
+def now(coarse=False):
+    """Returns the current time as a ``timestamp``, read directly from
+    the system clock via ``time.time_ns()``, or, if ``coarse`` is True,
+    from the shared ``coarse_clock``"""
+    if coarse:
+        return timestamp._from_ns((_clock or coarse_clock()).ns)
+    return timestamp._from_ns(_time_ns())
+
+def ntp_history(server=None):
+    """Returns a list of the ``ntp_sample`` objects of the most recent
+    NTP queries by ``time_ntp``, oldest first, optionally only those of
+    ``server``; up to 256 are kept"""
+    r = list(_ntp_history)
+    if server != None:
+        r = [i for i in r if i.server == server]
+    return r
+
+def parse_many(values, fmt=None, tz=None, array=False):
+    """Bulk interface for parsing string timestamps, as ``time``;
+    returns a tuple ``(result, errors)``
+
+    ``values`` is an iterable of strings in the ``base`` format or
+    given by ``fmt`` and the local timezone or given by ``tz``. The
+    format is compiled once into a specialized parser (formats with
+    directives it does not support fall back to ``strptime``), and the
+    timezone is resolved once. A UTC offset parsed via ``%z`` is
+    applied directly instead of ``tz``. The 'iso8601' format accepts
+    any ISO 8601 / RFC 3339 date and time, as ``time``, via a dedicated
+    parser.
+
+    ``result`` is a list of float epoch seconds in UTC, or a
+    ``timestamp_array`` if ``array`` is True. Values that cannot be
+    parsed do not raise; they are None in the list (0 in the array),
+    and ``errors`` is a list of ``(index, value, exception)`` tuples
+    for them.
+    """
+    if fmt == 'iso8601':
+        tz = 'UTC'
+    spec = timestamp.formats[fmt]
+    p = _isoparser if fmt == 'iso8601' else _parser.compile(spec)
+    z = _zone.compile(timezone(tz).pytz)
+    us = []
+    errors = []
+    for i, v in enumerate(values):
+        try:
+            if p.regex == None:
+                stats.count('strptime')
+                d = datetime.datetime.strptime(v, spec)
+                r = _timegm(d.timetuple())
+                offset = d.utcoffset()
+                if offset != None:
+                    offset = offset.days * 86400 + offset.seconds
+                r = (r, d.microsecond, offset)
+            else:
+                r = p.parse(v)
+        except (TypeError, ValueError) as e:
+            errors.append((i, v, e))
+            us.append(None)
+            continue
+        if r[2] == None:
+            us.append((z.utc(r[0]), r[1]))
+        else:
+            us.append((r[0] - r[2], r[1]))
+    if array:
+        _numpy()
+        return timestamp_array._from_micros(numpy.array([0 if i == None \
+            else i[0] * 10**6 + i[1] for i in us], dtype=numpy.int64)), errors
+    return [None if i == None else i[0] + i[1] / float(10**6) \
+        for i in us], errors
+
+def remove_ntp_hook(hook):
+    """Removes the function ``hook`` added via ``add_ntp_hook``"""
+    _ntp_hooks.remove(hook)
+
+def refresh_local_timezone():
+    """Discards the cached local timezone, detects it again, and
+    returns the new ``timezone`` object"""
+    _local['name'] = None
+    timezone._cache.discard(None)
+    timestamp._strings.clear()
+    try:
+        import tzlocal
+        tzlocal.reload_localzone()
+    except:
+        pass
+    return timezone()
+
 def time(value=None, tz=None, fmt=None, ntp=False):
     """Primitive functional interface for the ``timestamp`` class;
     similar to ``time.time()``, except more flexible and consistent;
@@ -577,7 +2161,9 @@ def time(value=None, tz=None, fmt=None, ntp=False):
       ``TimeTimezoneError`` if ``tz`` is specified or
       ``TimeFormatError`` if ``fmt`` is specified
     * string timestamp in the ``base`` format or given by ``fmt`` and
-      the local timezone or given by ``tz``
+      the local timezone or given by ``tz``; for the 'iso8601' format,
+      any ISO 8601 / RFC 3339 date and time, with an optional fraction
+      of a second and UTC offset (default: UTC)
     """
     if value == None:
         # now
@@ -589,37 +2175,49 @@ def time(value=None, tz=None, fmt=None, ntp=False):
             try:
                 r = time_ntp()
             except NTPError:
-                r = time_utc()
+                stats.count('time_ntp_fallback')
+                r = _time_ns() / 10**9
         else:
-            r = time_utc()
+            r = _time_ns() / 10**9
     else:
         # process as a string timestamp
-        d = datetime.datetime.strptime(value, timestamp.formats[fmt])
         if fmt == 'iso8601':
-            tz = 'UTC'
+            return _isoparser.ns(value) / 10**9
+        stats.count('strptime')
+        d = datetime.datetime.strptime(value, timestamp.formats[fmt])
         r = time_utc(d, tz)
     return r
 
-def time_ntp(server='us.pool.ntp.org'):
-    """Similar to ``time_utc``, except uses NTP
+def time_ntp(server='us.pool.ntp.org', ttl=64, port='ntp', timeout=5):
+    """Similar to ``time_utc``, except uses NTP; returns an
+    ``ntp_reading``
 
-    ``server`` can be any Internet or other network-based NTP server.
+    ``server`` can be any Internet or other network-based NTP server,
+    or a list of them, and ``port`` their port. Multiple servers are
+    queried concurrently and the response with the lowest round-trip
+    delay is used. ``timeout`` is the total number of seconds to wait
+    for responses.
+
+    The offset of the local clock measured via NTP is cached per
+    server (or list of servers) for ``ttl`` seconds; until it expires,
+    readings are the monotonic clock plus the cached offset, without
+    network access. ``ttl`` of 0 always queries the servers.
 
     ``time_ntp`` raises ``NTPError`` if it fails to retrieve the time
-    from the server.
+    from any server, or ``NTPTimeoutError`` if none responded in time;
+    the ``errors`` attribute lists the (server, exception) failures.
+    Each query is recorded in ``ntp_history`` and passed to the hooks
+    added via ``add_ntp_hook``.
     """
-    c = ntplib.NTPClient()
-    try:
-        res = c.request(server, version=3)
-    except:
-        raise NTPError
-    # convert from seconds since 1900 to seconds since 1970
-    r = res.tx_timestamp - 2208988800
-    # convert to utc
-    r = time_utc(r)
-    return r
-
-def time_utc(epoch=None, tz=None):
+    servers = [server] if isinstance(server, str) else list(server)
+    key = (tuple(servers), port)
+    r = _ntp.get(key)
+    if r == None or _monotonic() - r[1] >= ttl:
+        r = _ntp_query(servers, port, timeout)
+        _ntp[key] = r
+    return _ntp_reading(r)
+
+def time_utc(epoch=None, tz=None, dst='standard'):
     """Similar to ``time.time()``, except always returns float epoch
     seconds in UTC
 
@@ -631,22 +2229,29 @@ def time_utc(epoch=None, tz=None):
     * datetime.datetime object
     
     ``tz`` is passed to ``timezone()``.
+
+    ``dst`` is the policy for local times that do not exist or are
+    ambiguous because of a daylight saving time transition:
+    'standard' (default) resolves them as standard time, as pytz
+    ``localize`` does by default, 'daylight' resolves them as daylight
+    saving time, and 'raise' raises ``TimeNonexistentError`` or
+    ``TimeAmbiguousError``.
     """
     if epoch == None:
-        d = datetime.datetime.now()
+        return _time_ns() / 10**9
     elif isinstance(epoch, (int, float)):
         d = datetime.datetime.fromtimestamp(epoch)
     elif isinstance(epoch, datetime.datetime):
         d = epoch
     else:
         raise TimeEpochError('epoch must be None, int, float, or datetime')
-    d = timezone(tz).pytz.localize(d)
-    r = calendar.timegm(d.utctimetuple())
-    r += d.microsecond / float(10**6)
-    return r
+    return _utc_micros(d, tz, dst) / 10**6
 
-def cli(argv=None):
-    """Backend function for command line interface"""
+def cli(argv=None, stdin=None, stdout=None, stderr=None):
+    """Backend function for command line interface; returns the output
+    as a string, or None when streaming via ``--stdin`` (or an ``ARG``
+    of ``-``), which writes to ``stdout`` as it goes"""
+    import argparse
     p = argparse.ArgumentParser()
     p.add_argument('-V', '--version', action='store_true', \
         help='print version and exit')
@@ -661,11 +2266,22 @@ def cli(argv=None):
              '%%H:%%M:%%S %%Z"); try "all" for a demonstration')
     p.add_argument('-s', metavar='TIMEZONE', action='store', \
         help='search timezones')
+    p.add_argument('--stdin', action='store_true', \
+        help='read timestamps from stdin, one per line, and write one ' + \
+        'result per line as it goes; a string if there is one output ' + \
+        'timezone and format, otherwise compact JSON (NDJSON)')
+    p.add_argument('-j', metavar='N', action='store', type=int, \
+        help='with --stdin, convert in N worker processes')
     p.add_argument('args', metavar='ARG', action='store', nargs='*', \
         help='one or more timestamps; int/float epoch seconds,' + \
         ' string in the base format or the format specified by -F;' + \
-        ' default: now')
+        ' "-" is the same as --stdin; default: now')
     a = p.parse_args(argv)
+    stream = a.stdin or a.args == ['-']
+    if a.j != None and not stream:
+        p.error('-j requires --stdin or "-"')
+    if a.j != None and a.j < 1:
+        p.error('-j must be at least 1')
     if a.version:
         return __version__
     if a.s != None:
@@ -673,6 +2289,12 @@ def cli(argv=None):
         if not isinstance(r, list):
             r = [r]
         return '\n'.join(r)
+    if stream:
+        import sys
+        _stream(a.T, a.F, a.t or [None], a.f or [None], \
+            stdin or sys.stdin, stdout or sys.stdout, stderr or sys.stderr, \
+            workers=a.j)
+        return
     for i in (a.args, a.t, a.f):
         if i == None:
             i = []
@@ -688,12 +2310,122 @@ def cli(argv=None):
 def main():
     """Frontend function for command line interface"""
     import sys
-    print(cli(sys.argv[1:]))
+    r = cli(sys.argv[1:])
+    if r != None:
+        print(r)
+
+def __getattr__(name):
+    """Provides the ``kron_aio`` module as ``kron.aio``, imported on
+    first use (Python 3.7+; otherwise import ``kron_aio`` directly)"""
+    if name == 'aio':
+        import kron_aio
+        return kron_aio
+    raise AttributeError("module 'kron' has no attribute %r" % name)
+
+def _civil(days):
+    """Returns the proleptic Gregorian ``(year, month, day)`` of a number
+    of days since 1970-01-01; the inverse of ``_days_from_civil``"""
+    days += 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    m = mp + 3 if mp < 10 else mp - 9
+    return (yoe + era * 400 + (m <= 2), m, doy - (153 * mp + 2) // 5 + 1)
+
+def _civil_array(days):
+    """Returns NumPy arrays of the years, months, and days of a NumPy
+    int64 array of days since 1970-01-01, as ``_civil``"""
+    days = days + 719468
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    m = numpy.where(mp < 10, mp + 3, mp - 9)
+    return (yoe + era * 400 + (m <= 2), m, doy - (153 * mp + 2) // 5 + 1)
+
+def _datetime(us, tz):
+    """Returns epoch microseconds ``us`` as a datetime in the pytz
+    timezone ``tz``"""
+    d = datetime.datetime.fromtimestamp(us // 10**6, tz)
+    return d.replace(microsecond=us % 10**6)
+
+def _days_from_civil(y, m, d):
+    """Returns the number of days since 1970-01-01 of a proleptic
+    Gregorian date"""
+    y -= m <= 2
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m + (-3 if m > 2 else 9)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+def _fields(d):
+    """Returns the fields tuple of the datetime ``d`` used by format
+    plans"""
+    o = d.utcoffset()
+    if o != None:
+        o = o.days * 86400 + o.seconds
+    return (d.year, d.month, d.day, d.hour, d.minute, d.second,
+        d.microsecond, o, d.tzname() or '', d)
 
 def _json(obj):
     """Drop-in replacement for json.dumps() with pretty-printing"""
+    import json
     return json.dumps(obj, sort_keys=True, indent=4, separators=(',', ': '))
 
+def _local_stamp():
+    """Returns the values that identify the local timezone setting"""
+    r = [os.environ.get('TZ')]
+    for f in (os.lstat, os.stat):
+        try:
+            r.append(f('/etc/localtime').st_mtime)
+        except OSError:
+            r.append(None)
+    return tuple(r)
+
+def _local_timezone_name():
+    """Returns the cached local timezone name, detecting it via tzlocal
+    if needed"""
+    if _local['name'] == None:
+        stats.count('tzlocal')
+        _local['stamp'] = _local_stamp()
+        try:
+            import tzlocal
+            _local['name'] = tzlocal.get_localzone().zone
+        except:
+            _local['name'] = 'UTC'
+    return _local['name']
+
+def _micros(value):
+    """Returns int/float seconds as int microseconds, rounding floats to
+    6 decimal places"""
+    if isinstance(value, int):
+        return value * 10**6
+    us = value * 10**6
+    r = int(round(us))
+    if abs(abs(us - r) - 0.5) > 1e-6:
+        return r
+    # within float error of a half microsecond: round as round(value, 6)
+    return int(round(round(value, 6) * 10**6))
+
+def _micros_array(values):
+    """Returns a NumPy array of seconds as an int64 array of
+    microseconds"""
+    if values.dtype.kind in 'iu':
+        return values.astype(numpy.int64) * 10**6
+    return numpy.round(values.astype(numpy.float64) * 10**6) \
+        .astype(numpy.int64)
+
+def _nanos(value):
+    """Returns int/float seconds as int nanoseconds, rounding floats to
+    whole microseconds"""
+    if isinstance(value, int):
+        return value * 10**9
+    return _micros(value) * 1000
+
 def _nth(n):
     """Convert an integer to a string with ordinal letters
     For example, `_nth(1)` returns "1st", `_nth(2)` returns "2nd", etc.
@@ -703,6 +2435,290 @@ def _nth(n):
     n = str(int(n))
     return n + a.get(n[-2:], a.get(n[-1], t))
 
+def _ntp_error(servers, errors):
+    """Returns the ``NTPError`` for queries of ``servers`` that failed
+    with the list of (server, exception) ``errors``; servers without an
+    error timed out
+
+    The exception is ``NTPTimeoutError`` if all queries timed out; its
+    ``errors`` attribute lists the (server, exception) of each server,
+    and its cause is the first exception.
+    """
+    failed = dict(errors)
+    errors = [(i, failed.get(i) or _ntp_timeout()) for i in servers]
+    timeout = all(_ntp_error_type(e) == 'timeout' for i, e in errors)
+    cls = NTPTimeoutError if timeout else NTPError
+    r = cls('no response from ' + '; '.join('%s (%s)' % i for i in errors))
+    r.errors = errors
+    r.__cause__ = errors[0][1]
+    return r
+
+def _ntp_error_type(e):
+    """Returns the ``ntp_sample`` error type of the exception ``e``"""
+    import socket
+    if isinstance(e, socket.timeout) or \
+            isinstance(getattr(e, '__context__', None), socket.timeout):
+        return 'timeout'
+    if isinstance(e, socket.gaierror):
+        return 'resolve'
+    if isinstance(e, (OSError, socket.error)):
+        return 'network'
+    return 'protocol'
+
+def _ntp_query(servers, port, timeout):
+    """Queries the NTP ``servers`` concurrently and returns the
+    measurement cached by ``time_ntp`` from the response with the lowest
+    round-trip delay received within ``timeout`` seconds; queries still
+    pending then are recorded as timed out"""
+    import ntplib
+    start = _monotonic()
+    deadline = start + timeout
+    results = {}
+    done = threading.Condition()
+    def query(n, server):
+        try:
+            res = ntplib.NTPClient().request(server, version=3, port=port, \
+                timeout=timeout)
+            r = _ntp_sample(res)
+        except Exception as e:
+            res = None
+            r = e
+        with done:
+            late = n in results
+            if not late:
+                results[n] = r
+                done.notify()
+        if not late:
+            _ntp_record(server, port, _monotonic() - start, res, \
+                None if res else r)
+    for n, i in enumerate(servers):
+        t = threading.Thread(target=query, args=(n, i))
+        t.daemon = True
+        t.start()
+    with done:
+        while len(results) < len(servers):
+            left = deadline - _monotonic()
+            if left <= 0:
+                break
+            done.wait(left)
+        pending = [n for n in range(len(servers)) if n not in results]
+        for n in pending:
+            results[n] = None
+    for n in pending:
+        _ntp_record(servers[n], port, _monotonic() - start, \
+            error=_ntp_timeout())
+    r = [i for i in results.values() if isinstance(i, tuple)]
+    if r == []:
+        errors = [(servers[n], i) for n, i in sorted(results.items()) \
+            if i != None]
+        raise _ntp_error(servers, errors)
+    return min(r, key=lambda i: i[2])
+
+def _ntp_reading(r):
+    """Returns the ``ntp_reading`` for now from the measurement ``r``
+    cached by ``time_ntp``"""
+    now = _monotonic()
+    age = now - r[1]
+    return ntp_reading(now + r[0], age, r[2] + age * _ntp_drift)
+
+def _ntp_record(server, port, latency, res=None, error=None):
+    """Appends the ``ntp_sample`` of a query answered with the
+    ``ntplib.NTPStats`` ``res`` or failed with the exception ``error`` to
+    the history and calls the hooks; exceptions of hooks are ignored"""
+    if res != None:
+        r = ntp_sample(_time.time(), server, port, res.offset, res.delay, \
+            res.stratum, latency, None)
+    else:
+        r = ntp_sample(_time.time(), server, port, None, None, None, \
+            latency, _ntp_error_type(error))
+    _ntp_history.append(r)
+    for hook in list(_ntp_hooks):
+        try:
+            hook(r)
+        except Exception:
+            pass
+    return r
+
+def _ntp_sample(res):
+    """Returns the measurement cached by ``time_ntp`` from the
+    ``ntplib.NTPStats`` of a response received just now"""
+    now = _monotonic()
+    return (_time.time() + res.offset - now, now, max(res.delay, 0) / 2)
+
+def _ntp_timeout():
+    """Returns the exception recorded for an NTP query that timed out"""
+    import socket
+    return socket.timeout('timed out')
+
+def _numpy():
+    """Imports numpy on first use; raises ``NumpyMissingError`` if it is
+    not installed"""
+    global numpy
+    if numpy == None:
+        try:
+            import numpy
+        except ImportError:
+            raise NumpyMissingError('timestamp_array requires numpy')
+    return numpy
+
+def _offset(offset):
+    """Returns UTC offset seconds as a string as ``strftime('%z')``"""
+    if offset == None:
+        return ''
+    sign = '-' if offset < 0 else '+'
+    h, m = divmod(abs(offset), 3600)
+    m, s = divmod(m, 60)
+    if s:
+        r = '%s%02d%02d%02d' % (sign, h, m, s)
+    else:
+        r = '%s%02d%02d' % (sign, h, m)
+    _offsets[offset] = r
+    return r
+
+def _seconds(d):
+    """Returns the ``datetime.timedelta`` ``d`` as int seconds"""
+    return d.days * 86400 + d.seconds
+
+def _stream(tz, fmt, tzs, fmts, stdin, stdout, stderr, chunk=1024, \
+        workers=None):
+    """Converts the timestamps on the lines of ``stdin`` in chunks of
+    ``chunk`` lines and writes one line per timestamp to ``stdout``;
+    lines that cannot be parsed are reported to ``stderr``; chunks are
+    converted in ``workers`` processes if given, and written in input
+    order
+
+    The output timezones and formats are resolved and compiled before
+    any line is read, so that invalid ones raise here, with or without
+    ``workers``.
+    """
+    zones = [(i, timezone(i).name) for i in tzs]
+    specs = [timestamp._spec(i) for i in fmts if i != 'all']
+    for i in specs:
+        _plan.compile(*i)
+    config = (tz, fmt, tzs, fmts)
+    lines = iter(stdin)
+    blocks = iter(lambda: list(itertools.islice(lines, chunk)), [])
+    blocks = ((config, i * chunk, v) for i, v in enumerate(blocks))
+    if workers == None:
+        results = _stream_results(blocks)
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers, _stream_init, (zones, specs))
+        results = _stream_results(blocks, pool, workers * 2)
+    try:
+        for out, errors in results:
+            if errors != '':
+                stderr.write(errors)
+            if out != '':
+                stdout.write(out)
+    finally:
+        if workers != None:
+            pool.terminate()
+    stdout.flush()
+
+def _stream_chunk(args):
+    """Converts a chunk of lines for ``_stream``; returns a tuple of the
+    output and error text"""
+    (tz, fmt, tzs, fmts), n, block = args
+    plain = len(tzs) == 1 and len(fmts) == 1 and not 'all' in fmts
+    import json
+    dumps = json.JSONEncoder(sort_keys=True, separators=(',', ':')).encode
+    block = [i.strip() for i in block]
+    values = [None] * len(block)
+    strings = []
+    for i, v in enumerate(block):
+        if fmt != 'iso8601' and timestamp._number.search(v):
+            values[i] = timestamp(float(v))
+        elif v != '':
+            strings.append(i)
+    r, errors = parse_many([block[i] for i in strings], fmt, tz)
+    for i, v in zip(strings, r):
+        if v != None:
+            values[i] = timestamp(v)
+    errors = ''.join('kron: line %d: %s: %s\n' % (n + strings[i] + 1, v, e) \
+        for i, v, e in errors)
+    out = []
+    for v, t in zip(block, values):
+        if t is None:
+            continue
+        elif plain:
+            out.append(t.str(tzs[0], fmts[0]))
+        else:
+            out.append(dumps({v: t.dict(tzs, fmts)}))
+    return ''.join(i + '\n' for i in out), errors
+
+def _stream_init(zones, specs):
+    """Worker process initializer for ``_stream``; loads the output
+    timezones, as ``(name, resolved name)`` tuples, and compiles the
+    output format plans of ``specs`` once
+
+    Both are checked by ``_stream`` beforehand; any error is left to
+    the chunks, since a pool respawns workers whose initializer raises
+    forever.
+    """
+    try:
+        for name, resolved in zones:
+            timezone(resolved)
+            timezone(name)
+        for i in specs:
+            _plan.compile(*i)
+    except Exception:
+        pass
+
+def _stream_results(blocks, pool=None, window=None):
+    """Yields ``_stream_chunk`` results for ``blocks`` in order, in
+    ``pool`` with at most ``window`` chunks in flight if given"""
+    if pool == None:
+        for i in blocks:
+            yield _stream_chunk(i)
+        return
+    pending = collections.deque()
+    for i in blocks:
+        pending.append(pool.apply_async(_stream_chunk, (i,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def _timegm(t):
+    """Returns a UTC time tuple as int epoch seconds, as
+    ``calendar.timegm``"""
+    return _days_from_civil(t[0], t[1], t[2]) * 86400 + t[3] * 3600 + \
+        t[4] * 60 + t[5]
+
+def _utc_micros(d, tz=None, dst='standard'):
+    """Returns the datetime ``d`` as int epoch microseconds in UTC; a
+    naive ``d`` is in the local or given timezone, resolved per ``dst``
+    as in ``time_utc``"""
+    if d.tzinfo != None and d.utcoffset() != None:
+        r = _timegm(d.utctimetuple())
+    else:
+        r = _zone.compile(timezone(tz).pytz).utc(_timegm(d.timetuple()), dst)
+    return r * 10**6 + d.microsecond
+
+def _weekday(f):
+    """Returns the day of the week of a fields tuple; Monday is 0"""
+    if f[9] != None:
+        return f[9].weekday()
+    return (_days_from_civil(f[0], f[1], f[2]) + 3) % 7
+
+def _yearday(f):
+    """Returns the day of the year of a fields tuple; January 1st is
+    0"""
+    return _days_from_civil(f[0], f[1], f[2]) - _days_from_civil(f[0], 1, 1)
+
+# Statistics
+
+stats = statistics()
+
+if os.environ.get('KRON_STATS', '0') not in ('', '0'):
+    stats.enable()
+
+# Coarse clocks
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=clock._after_fork)
+
 # Main
 
 if __name__ == '__main__':
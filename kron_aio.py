@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+# Name: kron
+# Description: Uniform interface for dates and times
+# Version: 1.6.12
+# File: kron_aio.py
+# Author: qtfkwk <qtfkwk+kron@gmail.com>
+# Copyright: (C) 2016 by qtfkwk
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+"""Asyncio interface for kron (Python 3.6+); available as ``kron.aio``
+on Python 3.7+
+
+* ``atime_ntp``: ``kron.time_ntp`` via asyncio datagram endpoints,
+  without blocking the event loop
+* ``aparse`` and ``astr``: ``async for`` adapters that parse and format
+  sync or async streams in chunks via the same compiled parsers and
+  format plans as ``kron.timestamp``, yielding to the event loop
+  between chunks
+"""
+
+# Standard modules
+
+import asyncio
+import socket
+import time
+
+# Internal modules
+
+import kron
+
+# Classes
+
+class _protocol(asyncio.DatagramProtocol):
+    """Datagram protocol that sets ``future`` to the first datagram
+    received or error"""
+
+    def __init__(self, future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+# Functions
+
+async def aparse(values, fmt=None, tz=None, chunk=1024):
+    """Asynchronous generator of ``kron.timestamp`` objects for the
+    strings of the sync or async iterable ``values``, parsed as
+    ``kron.parse_many`` in chunks of ``chunk`` values; values that
+    cannot be parsed yield None"""
+    async for block in _chunks(values, chunk):
+        r, errors = kron.parse_many(block, fmt, tz)
+        for i in r:
+            yield None if i == None else kron.timestamp(i)
+        await asyncio.sleep(0)
+
+async def astr(values, tz=None, fmt=None, chunk=1024):
+    """Asynchronous generator of strings for the ``kron.timestamp``
+    objects or int/float epoch seconds of the sync or async iterable
+    ``values``, formatted as ``kron.timestamp.str`` in chunks of
+    ``chunk`` values; None yields None"""
+    async for block in _chunks(values, chunk):
+        for i in block:
+            if i is None:
+                yield None
+            elif isinstance(i, kron.timestamp):
+                yield i.str(tz, fmt)
+            else:
+                yield kron.timestamp(i).str(tz, fmt)
+        await asyncio.sleep(0)
+
+async def atime_ntp(server='us.pool.ntp.org', ttl=64, port='ntp', \
+        timeout=5):
+    """Same as ``kron.time_ntp``, except queries the servers via asyncio
+    datagram endpoints instead of blocking sockets; shares the cached
+    offsets, history, and hooks of ``kron.time_ntp``"""
+    servers = [server] if isinstance(server, str) else list(server)
+    key = (tuple(servers), port)
+    r = kron._ntp.get(key)
+    if r == None or kron._monotonic() - r[1] >= ttl:
+        number = _port(port)
+        tasks = [asyncio.ensure_future(_query(i, port, number)) \
+            for i in servers]
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for i in pending:
+            i.cancel()
+        if pending:
+            await asyncio.wait(pending)
+        r = [i.result() for i in done if i.exception() == None]
+        if r == []:
+            errors = [(s, i.exception()) for s, i in zip(servers, tasks) \
+                if i in done]
+            raise kron._ntp_error(servers, errors)
+        r = min(r, key=lambda i: i[2])
+        kron._ntp[key] = r
+    return kron._ntp_reading(r)
+
+async def _chunks(values, chunk):
+    """Yields lists of up to ``chunk`` items of the sync or async
+    iterable ``values``"""
+    r = []
+    if hasattr(values, '__aiter__'):
+        async for i in values:
+            r.append(i)
+            if len(r) >= chunk:
+                yield r
+                r = []
+    else:
+        for i in values:
+            r.append(i)
+            if len(r) >= chunk:
+                yield r
+                r = []
+    if r != []:
+        yield r
+
+def _port(port):
+    """Returns the UDP port number of the service name or number
+    ``port``"""
+    if isinstance(port, int):
+        return port
+    try:
+        return socket.getservbyname(port, 'udp')
+    except (OSError, socket.error):
+        return 123
+
+async def _query(server, port, number):
+    """Queries the NTP ``server`` at the port ``number`` (``port`` as
+    given), records the query in ``kron.ntp_history``, and returns the
+    measurement cached by ``kron.time_ntp``"""
+    start = kron._monotonic()
+    try:
+        res = await _request(server, number)
+    except asyncio.CancelledError:
+        kron._ntp_record(server, port, kron._monotonic() - start, \
+            error=kron._ntp_timeout())
+        raise
+    except Exception as e:
+        kron._ntp_record(server, port, kron._monotonic() - start, error=e)
+        raise
+    kron._ntp_record(server, port, kron._monotonic() - start, res)
+    return kron._ntp_sample(res)
+
+async def _request(server, port):
+    """Queries the NTP ``server`` and returns the ``ntplib.NTPStats`` of
+    the response"""
+    import ntplib
+    loop = asyncio.get_event_loop()
+    future = loop.create_future()
+    transport, protocol = await loop.create_datagram_endpoint( \
+        lambda: _protocol(future), remote_addr=(server, port))
+    try:
+        q = ntplib.NTPPacket(mode=3, version=3, \
+            tx_timestamp=ntplib.system_to_ntp_time(time.time()))
+        transport.sendto(q.to_data())
+        data = await future
+        res = ntplib.NTPStats()
+        res.from_data(data)
+        res.dest_timestamp = ntplib.system_to_ntp_time(time.time())
+        return res
+    finally:
+        transport.close()
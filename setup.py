@@ -28,7 +28,8 @@ if __name__ == '__main__':
             'tzlocal',
             'future',
         ],
-        py_modules=['kron'],
+        extras_require=dict(numpy=['numpy']),
+        py_modules=['kron', 'kron_aio'],
         description='Uniform interface for dates and times',
         entry_points=dict(console_scripts=['kron = kron:main']),
         classifiers=[
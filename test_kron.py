@@ -15,7 +15,10 @@ additional_ntp_servers = []
 
 import datetime
 import json
+import os
+import re
 import sys
+import time
 import unittest
 
 # External modules
@@ -23,6 +26,11 @@ import unittest
 import pytz
 import tzlocal
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # Internal modules
 
 import kron
@@ -75,6 +83,27 @@ class Test(unittest.TestCase):
         w = pytz.all_timezones
         self.assertEqual(h, w)
 
+    def test_timezone_search_index(self):
+        def search(name):
+            """reference linear scan"""
+            if name in pytz.all_timezones:
+                return name
+            name_ = name.lower()
+            matches = []
+            for t in pytz.all_timezones:
+                t_ = t.lower()
+                if name_ == t_:
+                    return t
+                if re.search(name, t) or re.search(name_, t_):
+                    matches.append(t)
+            return matches[0] if len(matches) == 1 else matches
+        a = ['york', 'new_york', 'Europe/', 'PACIFIC', 'Mad', '.*', '^us/',
+            'gmt+5', 'e.t', '^america/[a-c]', 'GMT-1', '_', '/', 'zulu']
+        for t in pytz.all_timezones:
+            a.extend([t[:3], t[-4:], t[2:6].upper()])
+        for n in a:
+            self.assertEqual(kron.timezone.search(n), search(n))
+
     def test_timezone_default(self):
         h = kron.timezone()
         w = h.name
@@ -103,6 +132,137 @@ class Test(unittest.TestCase):
         n = 'mad'
         self.assertRaises(kron.TimezoneMultiple, kron.timezone, n)
 
+    @unittest.skipIf(sys.version_info < (3, 7), 'requires -X importtime')
+    def test_import_time(self):
+        """import kron defers the optional and heavy modules and stays
+        within the import time budget"""
+        import subprocess
+        c = 'import kron, sys; print(" ".join(sorted(sys.modules)))'
+        p = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', c], \
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, \
+            cwd=os.path.dirname(os.path.abspath(kron.__file__)))
+        out, err = p.communicate()
+        h = out.decode().split()
+        for i in ('argparse', 'calendar', 'json', 'ntplib', 'numpy', \
+                'past', 'tzlocal'):
+            self.assertNotIn(i, h)
+        h = [int(i.split('|')[1]) for i in err.decode().splitlines() \
+            if i.split('|')[-1].strip() == 'kron']
+        self.assertEqual(len(h), 1)
+        self.assertLess(h[0], 100000)  # microseconds, cumulative
+
+    def test_zone_transitions(self):
+        """the transition table engine matches pytz in all timezones"""
+        epoch = datetime.datetime(1970, 1, 1)
+        def seconds(d):
+            d = d.utcoffset() if isinstance(d, datetime.datetime) else d
+            return d.days * 86400 + d.seconds
+        for name in pytz.all_timezones:
+            tz = pytz.timezone(name)
+            z = kron._zone.compile(tz)
+            times = [t for t in z.times if t > -2208988800][-12:]
+            for t in times + [0, 1457128501]:
+                for u in (t - 1, t, t + 1):
+                    d = pytz.utc.localize(epoch + \
+                        datetime.timedelta(seconds=u)).astimezone(tz)
+                    self.assertEqual(z.local(u)[::2], \
+                        (seconds(d), d.tzname()), (name, u))
+                for o in set([z.offset(t - 1), z.offset(t)]):
+                    for local in (t + o - 1, t + o, t + o + 1799):
+                        d = epoch + datetime.timedelta(seconds=local)
+                        for dst, is_dst in (('standard', False), \
+                                ('daylight', True), ('raise', None)):
+                            try:
+                                w = tz.localize(d, is_dst=is_dst)
+                                w = local - seconds(w)
+                            except (pytz.AmbiguousTimeError, \
+                                    pytz.NonExistentTimeError):
+                                w = None
+                            try:
+                                h = z.utc(local, dst)
+                            except (kron.TimeAmbiguousError, \
+                                    kron.TimeNonexistentError):
+                                h = None
+                            self.assertEqual(h, w, (name, local, dst))
+        h = kron.time_utc(datetime.datetime(2016, 3, 13, 2, 30), \
+            'America/New_York')
+        self.assertEqual(h, 1457854200)
+        h = kron.time_utc(datetime.datetime(2016, 3, 13, 2, 30), \
+            'America/New_York', 'daylight')
+        self.assertEqual(h, 1457850600)
+        self.assertRaises(kron.TimeNonexistentError, kron.time_utc, \
+            datetime.datetime(2016, 3, 13, 2, 30), 'America/New_York', \
+            'raise')
+        self.assertRaises(kron.TimeAmbiguousError, kron.time_utc, \
+            datetime.datetime(2016, 11, 6, 1, 30), 'America/New_York', \
+            'raise')
+
+    def test_civil_fields(self):
+        """integer civil date formatting matches strftime"""
+        import random
+        r = random.Random(18)
+        epoch = datetime.datetime(1970, 1, 1)
+        fmt = '%Y-%m-%dT%H:%M:%S.%f %a %b %j %U %W %w %y %I %p'
+        w = [-62135596800, -1, 0, 951782400, 1457128501, 253402300799]
+        w += [r.randint(-62135596800, 253402300799) for i in range(3000)]
+        w += [r.randint(-2208988800, 4102444800) for i in range(3000)]
+        for i in w:
+            d = epoch + datetime.timedelta(seconds=i)
+            if d.year < 1000:
+                continue  # %Y padding of strftime varies by platform
+            h = kron.timestamp(i).str('UTC', fmt)
+            self.assertEqual(h, d.strftime(fmt), i)
+            self.assertEqual(kron._civil((i - i % 86400) // 86400), \
+                (d.year, d.month, d.day))
+            self.assertEqual(kron.timestamp(i).iso8601(), \
+                d.strftime('%Y-%m-%dT%H:%M:%SZ'))
+        if numpy != None:
+            a = kron.timestamp_array(w)
+            h = [kron.timestamp(i).str('UTC', fmt) for i in w]
+            self.assertEqual(a.str('UTC', fmt), h)
+            h = [kron.timestamp(i).str('Europe/Paris') for i in w]
+            self.assertEqual(a.str('Europe/Paris'), h)
+
+    def test_timezone_cache(self):
+        kron.timezone.cache_clear()
+        h = kron.timezone('madrid')
+        self.assertIs(kron.timezone('madrid'), h)
+        self.assertIsNot(kron.timezone('Madrid'), h)
+        w = dict(hits=1, misses=2, evictions=0, size=2, maxsize=256)
+        self.assertEqual(kron.timezone.cache_info(), w)
+        def set_name():
+            h.name = 'UTC'
+        self.assertRaises(AttributeError, set_name)
+        self.assertRaises(kron.TimezoneFailure, kron.timezone, 'nonexistent')
+        self.assertEqual(kron.timezone.cache_info()['size'], 2)
+        try:
+            kron.timezone.cache_resize(1)
+            self.assertEqual(kron.timezone.cache_info()['evictions'], 1)
+            self.assertEqual(kron.timezone('Madrid').name, 'Europe/Madrid')
+            self.assertIsNot(kron.timezone('madrid'), h)
+        finally:
+            kron.timezone.cache_resize(256)
+
+    def test_local_timezone(self):
+        h = kron.local_timezone()
+        self.assertIs(h, kron.timezone())
+        self.assertIs(kron.local_timezone(check=True), h)
+        self.assertEqual(h.name, kron.timezone.search())
+        r = kron.refresh_local_timezone()
+        self.assertIsNot(r, h)
+        self.assertEqual(r.name, h.name)
+        self.assertIs(kron.local_timezone(), r)
+        tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'UTC' if tz != 'UTC' else 'Etc/UTC'
+        try:
+            self.assertIsNot(kron.local_timezone(check=True), r)
+        finally:
+            if tz == None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = tz
+            kron.refresh_local_timezone()
+
     def test_duration_default(self):
         h = kron.duration()
         self.assertEqual(h.value, 0)
@@ -199,6 +359,64 @@ class Test(unittest.TestCase):
         self.assertRaises(kron.DurationSubtractError, \
             subtract_duration_timestamp)
 
+    def test_slots(self):
+        t = kron.timestamp(1457128501.987349)
+        d = kron.duration(0.1)
+        for h in (t, d, t + d, t - t, d + d, d * 3):
+            self.assertFalse(hasattr(h, '__dict__'))
+            self.assertIsInstance(h.value, float)
+        h = kron.duration()
+        for i in range(10):
+            h = h + d
+        self.assertEqual(h, 1)
+        self.assertEqual(t + d - d, t)
+        self.assertEqual(kron.timestamp._from_micros(1457128501987349), t)
+        self.assertEqual(kron.duration._from_micros(100000), d)
+        t.value = 1457128501
+        self.assertEqual(t, kron.timestamp(1457128501))
+
+    def test_nanoseconds(self):
+        t = kron.timestamp.from_ns(1457128501987349123)
+        self.assertEqual(t.ns, 1457128501987349123)
+        self.assertEqual(t.us, 1457128501987349)
+        self.assertEqual(t.value, 1457128501.987349)
+        self.assertEqual(t.str('UTC', '%Y-%m-%d %H:%M:%S.%f'), \
+            '2016-03-04 21:55:01.987349')
+        self.assertEqual(kron.timestamp(1457128501.987349).ns, \
+            1457128501987349000)
+        d = kron.duration.from_ns(1)
+        self.assertEqual((t + d).ns, 1457128501987349124)
+        self.assertEqual((t + d - t).ns, 1)
+        self.assertNotEqual(t + d, t)
+        self.assertLess(t, t + d)
+        h = kron.duration()
+        for i in range(10**3):
+            h = h + kron.duration.from_ns(10**6)
+        self.assertEqual(h, 1)
+        self.assertEqual((kron.duration.from_ns(10) / 4).ns, 3)
+        self.assertEqual((kron.duration.from_ns(10) * 0.3).ns, 3)
+        self.assertEqual((kron.duration(0.000012) / 2).ns, 6000)
+        self.assertEqual(kron.duration(1.5).us, 1500000)
+
+    def test_hash(self):
+        t1 = kron.timestamp(1457128501.987349)
+        t2 = kron.timestamp(1457128501.987349)
+        t3 = kron.timestamp(1457128502)
+        self.assertEqual(hash(t1), hash(t2))
+        self.assertEqual(len(set([t1, t2, t3, t3 - 0])), 2)
+        h = {t1: 'a', t3: 'b'}
+        self.assertEqual(h[t2], 'a')
+        self.assertNotIn(t1 + 1, h)
+        d1 = kron.duration(5)
+        d2 = kron.duration(2.5) * 2
+        self.assertEqual(hash(d1), hash(d2))
+        self.assertEqual(hash(d1), hash(5))
+        self.assertEqual(hash(kron.duration(0.5)), hash(0.5))
+        self.assertEqual(len(set([d1, d2, 5, 5.0])), 1)
+        self.assertFalse(d1 != d2)
+        self.assertTrue(t1 != t3)
+        self.assertEqual(sorted([t3, t1]), [t1, t3])
+
     def test_timestamp_default(self):
         h = kron.timestamp()
         self.assertIsInstance(h.value, float)
@@ -411,6 +629,56 @@ class Test(unittest.TestCase):
             h = _h.str(tz, fmt)
             self.assertEqual(h, w)
 
+    def test_timestamp_format_plans(self):
+        a = list(kron.timestamp.formats.values()) + ['%U %W %w %j %p %I',
+            '%%%H%% %c %x %X %-d %e %G-%V %n %Q %', 'plain', '', '%Z%z%f']
+        for tz in ('UTC', 'America/New_York', 'Asia/Kolkata', 'Lord_Howe',
+        'Africa/Monrovia', 'Pacific/Chatham'):
+            z = pytz.timezone(kron.timezone.search(tz))
+            for i in range(-120, 240):
+                d = datetime.datetime.fromtimestamp(1e7 * i + 12345.678, z)
+                for fmt in a:
+                    h = kron.timestamp._format(d, fmt)
+                    self.assertEqual(h, d.strftime(fmt))
+        h = kron.timestamp(1457139301.123456)
+        try:
+            kron.timestamp.register_format('stamp', '%Y%m%d-%H%M%S.%f')
+            self.assertEqual(h.str('UTC', 'stamp'), '20160305-005501.123456')
+            self.assertIn('stamp', h.dict('UTC', 'all')['UTC'])
+        finally:
+            del kron.timestamp.formats['stamp']
+
+    def test_timestamp_str_cache(self):
+        fmts = ['%Y-%m-%d %H:%M:%S.%f', '%f|%f%%', 'rfc2822', 'basetz',
+            '%c %-f', 'x\x00%f']
+        for us in (0, 1, 999999, 123456, 500000, 7):
+            h = kron.timestamp(-86400 + 1457128501 + us / 1e6)
+            d = h._localtime('America/New_York')
+            for fmt in fmts:
+                h.str('America/New_York', fmt)
+                self.assertEqual(h.str('America/New_York', fmt),
+                    kron.timestamp._format(d, fmt))
+        h = kron.timestamp(1457128501.25)
+        try:
+            kron.timestamp.register_format('stamp', '%H:%M:%S.%f')
+            self.assertEqual(h.str('UTC', 'stamp'), '21:55:01.250000')
+            kron.timestamp.register_format('stamp', '%S')
+            self.assertEqual(h.str('UTC', 'stamp'), '01')
+        finally:
+            del kron.timestamp.formats['stamp']
+        try:
+            kron.timestamp.formats['mine'] = '%H'
+            self.assertEqual(h.str('UTC', 'mine'), '21')
+            kron.timestamp.formats['mine'] = '%M'
+            self.assertEqual(h.str('UTC', 'mine'), '55')
+        finally:
+            del kron.timestamp.formats['mine']
+        self.assertEqual(h.str('UTC', 'mine'), 'mine')
+        strings = kron.timestamp._strings
+        for i in range(strings.maxsize + 10):
+            kron.timestamp(i + 0.5).str('UTC', '%S.%f')
+        self.assertEqual(len(strings), strings.maxsize)
+
     def test_timestamp_dict(self):
         h = kron.timestamp(1457128501)
         w = {}
@@ -433,6 +701,15 @@ class Test(unittest.TestCase):
         )
         self.assertEqual(h.dict(list(w.keys()), ['base', 'basetz']), w)
 
+    def test_timestamp_dict_fan_out(self):
+        h = kron.timestamp(1457139301.123456)
+        t = [None, 'UTC', 'EST5EDT', 'Kolkata', 'Lord_Howe']
+        f = list(kron.timestamp.formats.keys()) + ['Month_Nth', '%j %c']
+        w = dict((i if i != None else 'localtz', dict((j, h.str(i, j)) \
+            for j in f)) for i in t)
+        self.assertEqual(h.dict(t, f), w)
+        self.assertEqual(h.json(t, f), kron._json(w))
+
     def test_timestamp_pseudo_format_all(self):
         a = '1457128501'
         h = kron.timestamp(a)
@@ -524,6 +801,73 @@ class Test(unittest.TestCase):
         )
         self.assertEqual(h.json(list(w.keys()), ['base', 'basetz']), kron._json(w))
 
+    @unittest.skipIf(numpy == None, 'skipping tests that require numpy')
+    def test_timestamp_array(self):
+        w = [1457128501, 1457128501.987349, kron.timestamp(0), 1457128502]
+        h = kron.timestamp_array(w)
+        self.assertEqual(len(h), 4)
+        self.assertEqual(h.us.dtype, numpy.int64)
+        self.assertEqual(h.us.tolist(), [1457128501000000,
+            1457128501987349, 0, 1457128502000000])
+        self.assertEqual(h[1], kron.timestamp(1457128501.987349))
+        self.assertEqual([i.value for i in h], h.values.tolist())
+        self.assertEqual(h.min(), kron.timestamp(0))
+        self.assertEqual(h.max(), kron.timestamp(1457128502))
+        self.assertEqual(h.argsort().tolist(), [2, 0, 1, 3])
+        self.assertEqual((h < h[1]).tolist(), [True, False, True, False])
+        self.assertEqual((h == h).tolist(), [True] * 4)
+        self.assertEqual((h + kron.duration(1)).us.tolist(),
+            (h.us + 10**6).tolist())
+        self.assertEqual((h - 1 + numpy.ones(4)).us.tolist(), h.us.tolist())
+        self.assertEqual((h - h[0]).tolist(), [0, 0.987349, 1457128501, 1])
+        self.assertIsInstance(h[1:3], kron.timestamp_array)
+        for tz in ('UTC', 'CST', 'Madrid'):
+            for fmt in ('basetz', 'rfc2822', 'iso8601', 'Month_Nth'):
+                self.assertEqual(h.str(tz, fmt), [i.str(tz, fmt) for i in h])
+        self.assertRaises(kron.TimestampAddError, lambda: h + h)
+        self.assertRaises(kron.TimestampSubtractError, lambda: h - 'x')
+        self.assertRaises(kron.TimestampComparisonError, lambda: h < 5)
+
+    def test_datetime_conversions(self):
+        h = kron.timestamp(1457128501.123456)
+        w = datetime.datetime(2016, 3, 4, 16, 55, 1, 123456)
+        d = h.to_datetime('America/New_York')
+        self.assertEqual(d.replace(tzinfo=None), w)
+        self.assertEqual(d.tzname(), 'EST')
+        self.assertEqual(kron.timestamp.from_datetime(d), h)
+        self.assertEqual(kron.timestamp.from_datetime(w, 'EST'), h)
+        self.assertEqual(kron.timestamp.from_datetime( \
+            h.to_datetime('UTC')).ns, h.ns)
+        self.assertEqual(kron.timestamp.from_ns(1457128501123456789) \
+            .to_datetime('UTC').microsecond, 123456)
+        self.assertRaises(kron.TimeAmbiguousError, \
+            kron.timestamp.from_datetime, \
+            datetime.datetime(2016, 11, 6, 1, 30), 'America/New_York', 'raise')
+        for v in (0, 3600.25, -86400.000001, 10**9 + 0.5):
+            td = kron.duration(v).to_timedelta()
+            self.assertEqual(td, datetime.timedelta(seconds=v))
+            self.assertEqual(kron.duration.from_timedelta(td), \
+                kron.duration(v))
+        if numpy != None:
+            a = kron.timestamp_array([1457128501.123456, 0, -1.5])
+            d = a.to_datetime64()
+            self.assertEqual(d.dtype, numpy.dtype('datetime64[us]'))
+            self.assertTrue(numpy.shares_memory(d, a.us))
+            self.assertEqual(d[0].astype(datetime.datetime), \
+                datetime.datetime(2016, 3, 4, 21, 55, 1, 123456))
+            b = kron.timestamp_array.from_datetime64(d)
+            self.assertTrue(numpy.shares_memory(b.us, a.us))
+            d = numpy.array(['2016-03-04T21:55:01'], dtype='datetime64[s]')
+            self.assertEqual(kron.timestamp_array.from_datetime64(d).us \
+                .tolist(), [1457128501000000])
+            self.assertEqual(kron.timestamp_array(d).us.tolist(), \
+                [1457128501000000])
+            d = numpy.array([1, -2, 3], dtype='timedelta64[ms]')
+            self.assertEqual((a + d).us.tolist(), (a.us + [1000, -2000, \
+                3000]).tolist())
+            self.assertEqual((a - d).us.tolist(), (a.us - [1000, -2000, \
+                3000]).tolist())
+
     def test_timestamp_utc(self):
         h = kron.timestamp(1457128501)
         w = '2016-03-04 21:55:01 UTC'
@@ -539,6 +883,38 @@ class Test(unittest.TestCase):
         self.assertEqual(h.str('UTC', 'rfc2822'), w)
         self.assertEqual(h.rfc2822('UTC'), w)
 
+    def test_parse_iso8601(self):
+        w = 1457128501
+        for i in ('2016-03-04T21:55:01Z', '2016-03-04 21:55:01', \
+                '2016-03-04t21:55:01z', '20160304T215501Z', \
+                '2016-03-04T23:55:01+02:00', '2016-03-04T16:25:01-0530', \
+                '2016-03-05T06:55:01+09'):
+            self.assertEqual(kron.time(i, fmt='iso8601'), w, i)
+            self.assertEqual(kron.timestamp(i, fmt='iso8601').ns, \
+                w * 10**9, i)
+        h = kron.timestamp('2016-03-04T21:55:01.123456789+00:00', \
+            fmt='iso8601')
+        self.assertEqual(h.ns, 1457128501123456789)
+        h = kron.timestamp('2016-03-04T21:55:01,5Z', fmt='iso8601')
+        self.assertEqual(h.value, 1457128501.5)
+        self.assertEqual(kron.time('2016-03-04', fmt='iso8601'), 1457049600)
+        for i in ('2016-03-04', '20160304'):
+            h = kron.timestamp(i, tz='UTC', fmt='iso8601')
+            self.assertEqual(h.value, 1457049600, i)
+        self.assertEqual(kron.time('2016-03-04T21:55', fmt='iso8601'), \
+            1457128500)
+        for i in ('2016-03-04T21:55:01Q', '2016-02-30T00:00:00Z', \
+                '2016-03-04T24:00:00Z', '2016-03-04T21:55:01.1234567890Z', \
+                '2016-03-04T21:55:01+2400', 'March 4, 2016', \
+                '2016-0304T2155:01Z', '2016-03-04T215501Z', \
+                '20160304T21:55:01Z', '20160304T215501+02:00', \
+                '2016-12-31T23:59:60Z'):
+            self.assertRaises(ValueError, kron.time, i, fmt='iso8601')
+        h, e = kron.parse_many(['2016-03-04T23:55:01.25+02:00', 'bad', \
+            '2016-03-04 21:55:01'], 'iso8601', 'EST5EDT')
+        self.assertEqual(h, [1457128501.25, None, w])
+        self.assertEqual([i[0] for i in e], [1])
+
     def test_timestamp_iso8601(self):
         h = kron.timestamp(1457128501)
         w = '2016-03-04T21:55:01Z'
@@ -737,6 +1113,8 @@ class Test(unittest.TestCase):
         h = kron.cli(self._args(a, t, f, T, F))
         w = '2014-01-23 09:06:12 UTC'
         self.assertEqual(h, w)
+        h = kron.cli(self._args(['20140123'], t, f, t, F))
+        self.assertEqual(h, '2014-01-23 00:00:00 UTC')
 
     def test_cli8(self):
         """version"""
@@ -744,6 +1122,67 @@ class Test(unittest.TestCase):
         self.assertEqual(kron.cli(['-V']), w)
         self.assertEqual(kron.cli(['--version']), w)
 
+    def test_cli_stdin(self):
+        """streaming timestamps from stdin"""
+        import io
+        i = io.StringIO(u'1457128501\n2016-03-04 21:55:02\n\nbad\n')
+        o = io.StringIO()
+        e = io.StringIO()
+        h = kron.cli(['-T', 'UTC', '-t', 'UTC', '-'], i, o, e)
+        self.assertIsNone(h)
+        w = '2016-03-04 21:55:01 UTC\n2016-03-04 21:55:02 UTC\n'
+        self.assertEqual(o.getvalue(), w)
+        self.assertTrue(e.getvalue().startswith('kron: line 4: bad: '))
+        i = io.StringIO(u'1457128501\n' * 3)
+        o = io.StringIO()
+        kron.cli(['--stdin', '-t', 'UTC', '-t', 'EST5EDT', '-f', 'HH'], \
+            i, o)
+        h = o.getvalue().splitlines()
+        self.assertEqual(len(h), 3)
+        w = {'1457128501': dict(EST5EDT=dict(HH='16'), UTC=dict(HH='21'))}
+        for j in h:
+            self.assertEqual(json.loads(j), w)
+            self.assertNotIn(' ', j)
+        o = io.StringIO()
+        kron.cli(['-T', 'UTC', '-t', 'UTC', '-F', 'iso8601', '-'], \
+            io.StringIO(u'20160304\n2016-03-04T21:55:01Z\n'), o)
+        w = '2016-03-04 00:00:00 UTC\n2016-03-04 21:55:01 UTC\n'
+        self.assertEqual(o.getvalue(), w)
+
+    def test_cli_stdin_workers(self):
+        """streaming timestamps from stdin in worker processes"""
+        import io
+        i = u''.join(u'%d\n' % (1457128501 + j * 3607) for j in range(3000))
+        a = ['-t', 'UTC', '-t', 'Asia/Tokyo', '-f', 'iso8601', '-f', 'HH']
+        w = io.StringIO()
+        kron.cli(a + ['-'], io.StringIO(i + u'bad\n'), w, io.StringIO())
+        h = io.StringIO()
+        e = io.StringIO()
+        kron.cli(a + ['-j', '2', '-'], io.StringIO(i + u'bad\n'), h, e)
+        self.assertEqual(h.getvalue(), w.getvalue())
+        self.assertEqual(len(h.getvalue().splitlines()), 3000)
+        self.assertTrue(e.getvalue().startswith('kron: line 3001: bad: '))
+        w = []
+        for a in (['-'], ['-j', '2', '-']):
+            a = ['-t', 'nonexistent_zone'] + a
+            try:
+                kron.cli(a, io.StringIO(u'1457128501\n'), io.StringIO())
+            except kron.TimezoneFailure as h:
+                w.append(str(h))
+        self.assertEqual(w, ['No timezone found for "nonexistent_zone"'] * 2)
+        h = io.StringIO()
+        kron.cli(['-T', 'UTC', '-t', 'UTC', '-F', 'iso8601', '-j', '2', '-'], \
+            io.StringIO(u'20160304\n'), h)
+        self.assertEqual(h.getvalue(), '2016-03-04 00:00:00 UTC\n')
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            for a in (['-j', '2', '1457128501'], ['-j', '0', '-']):
+                self.assertRaises(SystemExit, kron.cli, a)
+            self.assertIn('-j', sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
+
     def test_cli_search_timezone(self):
         h = kron.cli(['-s', ''])
         w = '\n'.join(pytz.all_timezones)
@@ -759,12 +1198,91 @@ class Test(unittest.TestCase):
         w = '\n'.join(['Atlantic/Madeira', 'Europe/Madrid'])
         self.assertEqual(h, w)
 
+    def test_parse_many(self):
+        w = 1457128501
+        for tz, fmt in (('UTC', None), ('EST', 'base'), ('Madrid', 'date'),
+        (None, 'iso8601'), ('UTC', 'rfc2822_'), ('Lord_Howe', 'ccyymmdd'),
+        ('Los_Angeles', 'hh_MM_SS_ampm'), ('Los_Angeles', 'julian'),
+        ('EST5EDT', '%d.%m.%Y %H:%M:%S.%f'), ('UTC', 'basetz')):
+            a = [kron.timestamp(w + i * 86399.25).str(tz, fmt or 'base') \
+                for i in range(-400, 400)]
+            h, e = kron.parse_many(a, fmt, tz)
+            self.assertEqual(e, [])
+            self.assertEqual(h, [kron.time(i, tz, fmt) for i in a])
+        a = ['Fri, 04 Mar 2016 22:55:01 +0100', 'Fri, 04 Mar 2016 21:55:01 Z',
+            'Fri, 04 Mar 2016 21:55:01', None, 'Fri, 31 Feb 2016 21:55:01 Z']
+        h, e = kron.parse_many(a, 'rfc2822', 'Madrid')
+        self.assertEqual(h, [w, w, None, None, None])
+        self.assertEqual([(i[0], i[1]) for i in e], [(2, a[2]), (3, a[3]),
+            (4, a[4])])
+        self.assertIsInstance(e[0][2], ValueError)
+        if numpy != None:
+            h, e = kron.parse_many(a, 'rfc2822', array=True)
+            self.assertIsInstance(h, kron.timestamp_array)
+            self.assertEqual(h.us.tolist(), [w * 10**6] * 2 + [0] * 3)
+        a = ['2016-03-04 21:55:01 UTC', '2016-03-04 21:55:01 gmt',
+            '2016-03-04 16:55:01 XYZ', '2016-03-04 22:55:01 CET']
+        if 'CET' in time.tzname:
+            a[3] = a[2]
+        h, e = kron.parse_many(a, 'basetz', 'UTC')
+        self.assertEqual(h, [w, w, None, None])
+        for i in a[2:]:
+            self.assertRaises(ValueError, kron.time, i, 'UTC', 'basetz')
+        a = ['03/04/16 21:55:01.%s' % i for i in range(3)]
+        h, e = kron.parse_many(a, '%x %X.%f', 'UTC')
+        self.assertEqual(h, [w, w + 0.1, w + 0.2])
+
     def test_time_utc(self):
         self.assertIsInstance(kron.time_utc(), float)
         self.assertIsInstance(kron.time_utc(123456.789), float)
         h = kron.time_utc(datetime.datetime.now())
         self.assertIsInstance(h, float)
         self.assertRaises(kron.TimeEpochError, kron.time_utc, 'nonexistent')
+        self.assertAlmostEqual(kron.time_utc(), time.time(), delta=0.1)
+
+    def test_now(self):
+        h = kron.now()
+        self.assertIsInstance(h, kron.timestamp)
+        self.assertAlmostEqual(h.value, time.time(), delta=0.1)
+        self.assertLessEqual(h, kron.now())
+        self.assertAlmostEqual(kron.timestamp().value, time.time(), delta=0.1)
+        c = kron.clock(0.01)
+        try:
+            h = c.ns
+            time.sleep(0.1)
+            self.assertGreater(c.ns, h)
+            self.assertAlmostEqual(c.value, time.time(), delta=0.1)
+            self.assertIsInstance(c.now(), kron.timestamp)
+        finally:
+            c.stop()
+        h = c.ns
+        time.sleep(0.05)
+        self.assertEqual(c.ns, h)
+        c = kron.coarse_clock()
+        self.assertIs(kron.coarse_clock(0.002), c)
+        self.assertEqual(c.tick, 0.002)
+        self.assertAlmostEqual(kron.now(True).value, time.time(), delta=0.1)
+        c.stop()
+        self.assertIsNot(kron.coarse_clock(), c)
+        self.assertAlmostEqual(kron.now(True).value, time.time(), delta=0.1)
+
+    @unittest.skipUnless(hasattr(os, 'register_at_fork'), 'requires fork')
+    def test_now_fork(self):
+        kron.now(True)
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                h = kron.now(True).value
+                time.sleep(0.3)
+                os.write(w, str(kron.now(True).value - h).encode())
+            finally:
+                os._exit(0)
+        os.close(w)
+        h = float(os.read(r, 64).decode())
+        os.close(r)
+        os.waitpid(pid, 0)
+        self.assertGreater(h, 0.2)
 
     @unittest.skipIf(skip_network_tests, \
     'skipping NTP tests that require network')
@@ -778,6 +1296,125 @@ class Test(unittest.TestCase):
     def test_time_ntp(self):
         self.assertRaises(kron.NTPError, kron.time_ntp, 'nonexistent')
 
+    def _ntp_server(self, offset, delay=0, host='127.0.0.1', port=0):
+        """Starts a local NTP stand-in answering with the system time plus
+        ``offset`` seconds after ``delay`` seconds; returns the socket,
+        its port, and the list of request addresses"""
+        import ntplib, socket, threading, time
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((host, port))
+        requests = []
+        def serve():
+            while True:
+                try:
+                    data, addr = sock.recvfrom(1024)
+                except socket.error:
+                    return
+                requests.append(addr)
+                time.sleep(delay)
+                q = ntplib.NTPPacket()
+                q.from_data(data)
+                t = ntplib.system_to_ntp_time(time.time() + offset)
+                r = ntplib.NTPPacket(version=3, mode=4, tx_timestamp=t)
+                r.stratum = 1
+                r.orig_timestamp = q.tx_timestamp
+                r.recv_timestamp = t
+                try:
+                    sock.sendto(r.to_data(), addr)
+                except socket.error:
+                    return
+        t = threading.Thread(target=serve)
+        t.daemon = True
+        t.start()
+        return sock, sock.getsockname()[1], requests
+
+    def test_time_ntp_cache(self):
+        import time
+        sock, port, requests = self._ntp_server(100)
+        try:
+            h1 = kron.time_ntp('127.0.0.1', port=port)
+            h2 = kron.time_ntp('127.0.0.1', port=port)
+            self.assertEqual(len(requests), 1)
+            self.assertIsInstance(h1, kron.ntp_reading)
+            self.assertIsInstance(h1, float)
+            self.assertAlmostEqual(h1, time.time() + 100, delta=1)
+            self.assertGreaterEqual(h2, h1)
+            self.assertGreaterEqual(h2.age, h1.age)
+            self.assertGreaterEqual(h2.uncertainty, h1.uncertainty)
+            self.assertLess(h2.uncertainty, 1)
+            h3 = kron.time_ntp('127.0.0.1', ttl=0, port=port)
+            self.assertEqual(len(requests), 2)
+            self.assertLess(h3.age, h2.age + 1)
+        finally:
+            sock.close()
+            kron._ntp.clear()
+
+    def test_time_ntp_servers(self):
+        import socket, time
+        sock, port, requests = self._ntp_server(100)
+        socks = [sock]
+        try:
+            try:
+                socks.append(self._ntp_server(200, 0.5, '127.0.0.2', port)[0])
+                silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                socks.append(silent)
+                silent.bind(('127.0.0.3', port))
+            except socket.error:
+                self.skipTest('requires 127.0.0.2 and 127.0.0.3')
+            servers = ['127.0.0.3', '127.0.0.2', '127.0.0.1']
+            start = time.time()
+            h = kron.time_ntp(servers, port=port, timeout=1)
+            self.assertLess(time.time() - start, 2)
+            self.assertAlmostEqual(h, time.time() + 100, delta=0.4)
+            self.assertLess(h.uncertainty, 0.25)
+            self.assertEqual(len(requests), 1)
+            start = time.time()
+            self.assertRaises(kron.NTPError, kron.time_ntp, ['127.0.0.3'], \
+                port=port, timeout=0.5)
+            self.assertLess(time.time() - start, 1.5)
+        finally:
+            for i in socks:
+                i.close()
+            kron._ntp.clear()
+
+    def test_ntp_history(self):
+        import time
+        kron._ntp_history.clear()
+        samples = []
+        kron.add_ntp_hook(samples.append)
+        kron.add_ntp_hook(lambda i: 1 / 0)
+        sock, port, requests = self._ntp_server(100)
+        try:
+            kron.time_ntp('127.0.0.1', port=port)
+            h = kron.ntp_history()
+            self.assertEqual(h, samples)
+            self.assertEqual(len(h), 1)
+            self.assertEqual((h[0].server, h[0].port, h[0].stratum, \
+                h[0].error), ('127.0.0.1', port, 1, None))
+            self.assertAlmostEqual(h[0].offset, 100, delta=1)
+            self.assertAlmostEqual(h[0].time, time.time(), delta=1)
+            self.assertLess(h[0].delay, 1)
+            self.assertGreaterEqual(h[0].latency, 0)
+            sock.close()
+            with self.assertRaises(kron.NTPTimeoutError) as e:
+                kron.time_ntp('127.0.0.1', port=port, ttl=0, timeout=0.5)
+            self.assertEqual(e.exception.errors[0][0], '127.0.0.1')
+            self.assertIsNotNone(e.exception.__cause__)
+            h = kron.ntp_history('127.0.0.1')
+            self.assertEqual(len(h), 2)
+            self.assertEqual((h[1].offset, h[1].error), (None, 'timeout'))
+            with self.assertRaises(kron.NTPError) as e:
+                kron.time_ntp('nonexistent.invalid', port=port)
+            self.assertNotIsInstance(e.exception, kron.NTPTimeoutError)
+            self.assertEqual(kron.ntp_history('nonexistent.invalid')[0].error,
+                'resolve')
+            self.assertEqual(len(samples), 3)
+        finally:
+            sock.close()
+            kron.remove_ntp_hook(samples.append)
+            del kron._ntp_hooks[:]
+            kron._ntp.clear()
+
     def test_time(self):
         self.assertIsInstance(kron.time(), float)
         self.assertRaises(kron.TimeTimezoneError, kron.time, None, 'UTC')
@@ -799,6 +1436,43 @@ class Test(unittest.TestCase):
         self.assertIsInstance(h, float)
         self.assertEqual(h, w)
 
+    def test_stats(self):
+        functions = (kron.time, kron.time_utc, kron.timestamp.str)
+        kron.enable_stats()
+        try:
+            kron.timestamp._strings.clear()
+            kron.stats.reset()
+            for i in range(kron.stats.size + 5):
+                kron.timestamp(1457128501 + i).str('UTC')
+            kron.time('2016-03-04 21:55:01', 'UTC')
+            self.assertRaises(kron.TimezoneFailure, kron.timezone, 'xyzzy_')
+            h = kron.stats.snapshot()
+            self.assertTrue(h['enabled'])
+            c = h['calls']['timestamp.str']
+            self.assertEqual(c['count'], kron.stats.size + 5)
+            self.assertEqual(c['errors'], 0)
+            self.assertTrue(c['min'] <= c['p50'] <= c['p90'] <= c['p99'] \
+                <= c['max'])
+            self.assertAlmostEqual(c['mean'] * c['count'], c['total'])
+            self.assertEqual(h['calls']['time']['count'], 1)
+            self.assertEqual(h['calls']['time_utc']['count'], 1)
+            self.assertEqual(h['calls']['timezone']['errors'], 1)
+            self.assertEqual(h['counters'], {'strptime': 1})
+            self.assertEqual(h['caches']['strings']['hit_rate'], 0)
+            self.assertGreater(h['caches']['plan']['hit_rate'], 0.99)
+            json.dumps(h)
+            kron.stats.reset()
+            h = kron.stats.snapshot()
+            self.assertEqual((h['calls'], h['counters']), ({}, {}))
+            self.assertIsNone(h['caches']['strings']['hit_rate'])
+        finally:
+            kron.disable_stats()
+        self.assertEqual((kron.time, kron.time_utc, kron.timestamp.str), \
+            functions)
+        kron.time('2016-03-04 21:55:01', 'UTC')
+        self.assertFalse(kron.stats.snapshot()['enabled'])
+        self.assertEqual(kron.stats.snapshot()['calls'], {})
+
 if __name__ == '__main__':
     unittest.main()
 
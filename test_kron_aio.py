@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# Name: kron
+# Description: Uniform interface for dates and times
+# Version: 1.6.12
+# File: test_kron_aio.py
+# Author: qtfkwk <qtfkwk+kron@gmail.com>
+# Copyright: (C) 2016 by qtfkwk
+# License: BSD 2-Clause License (https://opensource.org/licenses/BSD-2-Clause)
+
+# Standard modules
+
+import asyncio
+import time
+import unittest
+
+# External modules
+
+import ntplib
+
+# Internal modules
+
+import kron
+import kron_aio
+
+# Classes
+
+class _server(asyncio.DatagramProtocol):
+    """Local NTP stand-in answering with the system time plus
+    ``offset`` seconds"""
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.requests = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.requests.append(addr)
+        q = ntplib.NTPPacket()
+        q.from_data(data)
+        t = ntplib.system_to_ntp_time(time.time() + self.offset)
+        r = ntplib.NTPPacket(version=3, mode=4, tx_timestamp=t)
+        r.stratum = 1
+        r.orig_timestamp = q.tx_timestamp
+        r.recv_timestamp = t
+        self.transport.sendto(r.to_data(), addr)
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        kron._ntp.clear()
+
+    def _collect(self, agen):
+        async def collect():
+            return [i async for i in agen]
+        return self.loop.run_until_complete(collect())
+
+    def test_aio_attribute(self):
+        self.assertIs(kron.aio, kron_aio)
+
+    def test_atime_ntp(self):
+        async def run():
+            loop = asyncio.get_event_loop()
+            transport, server = await loop.create_datagram_endpoint( \
+                lambda: _server(100), local_addr=('127.0.0.1', 0))
+            port = transport.get_extra_info('sockname')[1]
+            try:
+                h1 = await kron_aio.atime_ntp('127.0.0.1', port=port)
+                h2 = await kron_aio.atime_ntp(['127.0.0.1'], port=port)
+                h3 = kron.time_ntp(['127.0.0.1'], port=port)
+                return h1, h2, h3, server.requests
+            finally:
+                transport.close()
+        h1, h2, h3, requests = self.loop.run_until_complete(run())
+        self.assertIsInstance(h1, kron.ntp_reading)
+        self.assertAlmostEqual(h1, time.time() + 100, delta=1)
+        self.assertGreaterEqual(h2.age, 0)
+        self.assertGreaterEqual(h3, h2)
+        # a server and a list of it share the offset cached by either
+        self.assertEqual(len(requests), 1)
+
+    def test_atime_ntp_timeout(self):
+        start = time.time()
+        kron._ntp_history.clear()
+        self.assertRaises(kron.NTPError, self.loop.run_until_complete, \
+            kron_aio.atime_ntp('127.0.0.1', port=9, timeout=0.5))
+        self.assertLess(time.time() - start, 1.5)
+        h = kron.ntp_history()
+        self.assertEqual(len(h), 1)
+        self.assertEqual((h[0].server, h[0].port), ('127.0.0.1', 9))
+        self.assertIn(h[0].error, ('timeout', 'network'))
+
+    def test_aparse_astr(self):
+        w = ['2016-03-04 21:55:01', 'bad', '2016-03-04 21:55:02']
+        async def values():
+            for i in w:
+                yield i
+        h = self._collect(kron_aio.aparse(values(), tz='UTC', chunk=2))
+        self.assertEqual(h[0], kron.timestamp(1457128501))
+        self.assertIsNone(h[1])
+        self.assertEqual(h[2], kron.timestamp(1457128502))
+        h = self._collect(kron_aio.astr(h + [1457128503], 'UTC', 'iso8601'))
+        self.assertEqual(h, ['2016-03-04T21:55:01Z', None, \
+            '2016-03-04T21:55:02Z', '2016-03-04T21:55:03Z'])
+
+if __name__ == '__main__':
+    unittest.main()